@@ -0,0 +1,297 @@
+#!/usr/bin/env python
+# akakce_resolver.py
+
+import os
+import re
+import time
+import asyncio
+
+from config import DATABASE_CONFIG
+from db_pool import PoolManager
+from logconfig import logger, flush_logs
+
+AKAKCE_DB = "akakce"
+AKAKCE_CHUNK_SIZE = 500
+AKAKCE_POOL_MINSIZE = 1
+AKAKCE_POOL_MAXSIZE = 5
+AKAKCE_REFRESH_INTERVAL = float(os.getenv("AKAKCE_REFRESH_INTERVAL", "60"))
+AKAKCE_MISS_TTL = float(os.getenv("AKAKCE_MISS_TTL", "900"))
+# Akakçe tablosunda güncellenme zamanı tutan bir kolon varsa delta yenileme onu kullanır;
+# yoksa satır checksum'ları karşılaştırılır.
+AKAKCE_UPDATED_COLUMN = os.getenv("AKAKCE_UPDATED_COLUMN", "").strip()
+if AKAKCE_UPDATED_COLUMN and not re.fullmatch(r"\w+", AKAKCE_UPDATED_COLUMN):
+    logger.warning("AKAKCE_UPDATED_COLUMN geçersiz (%s); checksum yenileme kullanılacak.", AKAKCE_UPDATED_COLUMN)
+    AKAKCE_UPDATED_COLUMN = ""
+# Güncellenme kolonu kullanılırken her N yenilemede bir checksum turu yapılır;
+# silinen satırlar ancak bu turda fark edilir
+AKAKCE_FULL_REFRESH_EVERY = max(1, int(os.getenv("AKAKCE_FULL_REFRESH_EVERY", "10")))
+
+AKAKCE_PRICE_COLUMNS = """
+    satici_bir,    satici_bir_fiyat,
+    satici_iki,    satici_iki_fiyat,
+    satici_uc,     satici_uc_fiyat
+"""
+AKAKCE_CHECKSUM = f"CRC32(CONCAT_WS('|', {AKAKCE_PRICE_COLUMNS}))"
+AKAKCE_COLUMNS = f"urun_adi, {AKAKCE_CHECKSUM}, {AKAKCE_PRICE_COLUMNS}"
+
+
+def normalize_akakce_name(name: str) -> str:
+    """
+    Akakçe ürün adını sözlük anahtarı olarak kullanılabilecek hale getirir.
+    MySQL karşılaştırması büyük/küçük harf duyarsız olduğundan burada da öyle yapılır.
+    """
+    return " ".join((name or "").split()).lower()
+
+
+def select_primary_price(row) -> float | None:
+    """
+    Üç satıcı + fiyat satırından öncelik sırasına göre en uygun fiyatı seçer.
+    """
+    s1, p1, s2, p2, s3, p3 = row
+    # normalize et
+    n1 = (s1 or "").strip().lower().replace(" ", "")
+    n2 = (s2 or "").strip().lower().replace(" ", "")
+
+    # 1) İlk satıcı “mediamarkt” ise:
+    #       → ikincil “pttavm” ise p3, değilse p2
+    # 2) İlk satıcı “pttavm” ise:
+    #       → ikincil “mediamarkt” ise p3, değilse p2
+    # 3) Diğer tüm durumlar → p1
+    if n1 == "mediamarkt":
+        chosen = p3 if n2 == "pttavm" else p2
+    elif n1 == "pttavm":
+        chosen = p3 if n2 == "mediamarkt" else p2
+    else:
+        chosen = p1
+    return float(chosen) if chosen is not None else None
+
+
+class AkakceResolver:
+    """
+    Akakçe veritabanına tek, uzun ömürlü bir pool üzerinden bağlanır ve
+    bir döngüdeki tüm ürün adlarının fiyatını parça parça IN (...) sorgularıyla çözer.
+
+    Çözülen satırlar bellekte normalize edilmiş ürün adına göre tutulur (replika);
+    replika kendi aralığında delta yenilenir, eşleşmeyen adlar ise TTL'li
+    negatif cache'te bekletilir. Böylece fırsat değerlendirmesi sözlük aramasına döner.
+    """
+
+    def __init__(
+        self,
+        chunk_size: int = AKAKCE_CHUNK_SIZE,
+        miss_ttl: float = AKAKCE_MISS_TTL,
+        updated_column: str = AKAKCE_UPDATED_COLUMN,
+        full_refresh_every: int = AKAKCE_FULL_REFRESH_EVERY
+    ):
+        self.chunk_size = chunk_size
+        self.miss_ttl = miss_ttl
+        self.updated_column = updated_column
+        self.full_refresh_every = full_refresh_every
+        self._refresh_count = 0
+        self._pool = None
+        # normalize_ad -> (orijinal_ad, checksum, fiyat)
+        self._entries = {}
+        # normalize_ad -> negatif cache bitiş zamanı (monotonic)
+        self._misses = {}
+        self._updated_marker = None
+        self._refresh_task = None
+
+    async def _get_pool(self):
+        if self._pool is None:
+            self._pool = PoolManager(
+                {
+                    **DATABASE_CONFIG,
+                    'db': AKAKCE_DB,
+                    'autocommit': True,
+                    'minsize': AKAKCE_POOL_MINSIZE,
+                    'maxsize': AKAKCE_POOL_MAXSIZE,
+                },
+                name=AKAKCE_DB
+            )
+        return await self._pool.start()
+
+    async def _query_chunks(self, select: str, names: list[str], extra_where: str = "", extra_args=()):
+        """
+        urun_adi IN (...) sorgusunu parça parça çalıştırır ve tüm satırları döner.
+        """
+        rows = []
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            async with conn.cursor() as cur:
+                for i in range(0, len(names), self.chunk_size):
+                    chunk = names[i:i + self.chunk_size]
+                    placeholders = ", ".join(["%s"] * len(chunk))
+                    await cur.execute(
+                        f"SELECT {select} FROM products WHERE urun_adi IN ({placeholders}){extra_where}",
+                        [*chunk, *extra_args]
+                    )
+                    rows.extend(await cur.fetchall())
+        return rows
+
+    async def _fetch_rows(self, names: list[str]) -> dict:
+        """
+        Verilen adlar için Akakçe satırlarını normalize edilmiş ada göre döner.
+        Aynı ada ait birden fazla satır varsa ilk gelen kullanılır (eski LIMIT 1 davranışı).
+        """
+        rows_by_name = {}
+        for row in await self._query_chunks(AKAKCE_COLUMNS, names):
+            rows_by_name.setdefault(normalize_akakce_name(row[0]), row)
+        return rows_by_name
+
+    def _store(self, row):
+        name, checksum, *sellers = row
+        key = normalize_akakce_name(name)
+        self._entries[key] = (name, checksum, select_primary_price(sellers))
+        self._misses.pop(key, None)
+
+    def _is_missing(self, key: str) -> bool:
+        expires = self._misses.get(key)
+        if expires is None:
+            return False
+        if expires <= time.monotonic():
+            del self._misses[key]
+            return False
+        return True
+
+    def lookup(self, product_name: str) -> float | None:
+        """
+        Replikadan fiyatı döner; ağ çağrısı yapmaz.
+        """
+        entry = self._entries.get(normalize_akakce_name(product_name))
+        return entry[2] if entry else None
+
+    async def resolve(self, product_names) -> dict:
+        """
+        Ürün adlarını tekilleştirip Akakçe fiyatlarını tek geçişte çözer.
+        Replikada olan veya negatif cache'te bekleyen adlar için DB'ye gidilmez.
+        Dönüş: {ürün_adı: fiyat veya None}
+        """
+        names = list(dict.fromkeys(n for n in product_names if n))
+        if not names:
+            return {}
+
+        to_query = []
+        for name in names:
+            key = normalize_akakce_name(name)
+            if key not in self._entries and not self._is_missing(key):
+                to_query.append(name)
+
+        if to_query:
+            logger.debug("AkakceResolver.resolve: %d/%d ürün adı DB'den sorgulanıyor.", len(to_query), len(names))
+            flush_logs()
+            try:
+                rows_by_name = await self._fetch_rows(to_query)
+            except Exception as e:
+                logger.exception("AkakceResolver.resolve: Hata: %s", e)
+                flush_logs()
+                rows_by_name = None
+
+            if rows_by_name is not None:
+                expires = time.monotonic() + self.miss_ttl
+                for name in to_query:
+                    key = normalize_akakce_name(name)
+                    row = rows_by_name.get(key)
+                    if row is None:
+                        logger.warning("AkakceResolver.resolve: AK kaydı yok: %s", name)
+                        self._misses[key] = expires
+                    else:
+                        self._store(row)
+                flush_logs()
+
+        return {name: self.lookup(name) for name in names}
+
+    async def refresh(self):
+        """
+        Replikadaki satırları delta olarak yeniler.
+        Güncellenme kolonu tanımlıysa yalnızca ondan sonra değişen satırlar çekilir;
+        aksi halde checksum'lar karşılaştırılıp sadece değişen satırlar tekrar okunur.
+        Kolon kullanılsa da her full_refresh_every turda bir checksum turu silinenleri temizler.
+        """
+        if not self._entries:
+            return
+        names = [entry[0] for entry in self._entries.values()]
+        t0 = time.monotonic()
+        self._refresh_count += 1
+        if self.updated_column and self._refresh_count % self.full_refresh_every:
+            changed = await self._refresh_by_updated_column(names)
+        else:
+            changed = await self._refresh_by_checksum(names)
+        logger.debug("AkakceResolver.refresh: %d/%d satır güncellendi (%.2f sn).",
+                     changed, len(names), time.monotonic() - t0)
+        flush_logs()
+
+    async def _refresh_by_updated_column(self, names: list[str]) -> int:
+        col = self.updated_column
+        if self._updated_marker is None:
+            rows = await self._query_chunks(f"{AKAKCE_COLUMNS}, {col}", names)
+        else:
+            # >=: işaretle aynı zaman damgasıyla sonradan yazılan satırlar da kaçmaz
+            rows = await self._query_chunks(
+                f"{AKAKCE_COLUMNS}, {col}", names, f" AND {col} >= %s", (self._updated_marker,)
+            )
+        rows_by_name = {}
+        for row in rows:
+            *data, updated = row
+            rows_by_name.setdefault(normalize_akakce_name(data[0]), data)
+            if updated is not None and (self._updated_marker is None or updated > self._updated_marker):
+                self._updated_marker = updated
+        changed = 0
+        for key, data in rows_by_name.items():
+            entry = self._entries.get(key)
+            if entry is None or entry[1] != data[1]:
+                changed += 1
+            self._store(data)
+        return changed
+
+    async def _refresh_by_checksum(self, names: list[str]) -> int:
+        current = {}
+        for name, checksum in await self._query_chunks(f"urun_adi, {AKAKCE_CHECKSUM}", names):
+            current.setdefault(normalize_akakce_name(name), checksum)
+
+        changed, removed = [], []
+        for key, (name, checksum, _) in self._entries.items():
+            if key not in current:
+                removed.append(key)
+            elif current[key] != checksum:
+                changed.append(name)
+
+        expires = time.monotonic() + self.miss_ttl
+        for key in removed:
+            del self._entries[key]
+            self._misses[key] = expires
+        if changed:
+            for row in (await self._fetch_rows(changed)).values():
+                self._store(row)
+        return len(changed) + len(removed)
+
+    async def refresh_loop(self, interval: float = AKAKCE_REFRESH_INTERVAL):
+        logger.info("AkakceResolver.refresh_loop: Başlatıldı (%.0f sn aralık).", interval)
+        flush_logs()
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error("AkakceResolver.refresh_loop: Hata: %s", e)
+                flush_logs()
+
+    def start_refresh(self, interval: float = AKAKCE_REFRESH_INTERVAL):
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self.refresh_loop(interval))
+        return self._refresh_task
+
+    async def close(self):
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._refresh_task = None
+        if self._pool is not None:
+            self._pool.close()
+            await self._pool.wait_closed()
+            self._pool = None
+
+
+akakce_resolver = AkakceResolver()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+# basket_http.py
+
+import os
+import re
+import json
+import httpx
+from bs4 import BeautifulSoup
+
+from logconfig import logger, flush_logs
+
+# "http": önce HTTP ile dene, challenge/parse hatasında tarayıcıya düş
+# "browser": her zaman Playwright kullan
+BASKET_FETCH_MODE = os.getenv("BASKET_FETCH_MODE", "http").strip().lower()
+
+BASKET_SELECTOR = "div[data-test='mms-seller-basket']"
+LINE_ITEM_SELECTOR = "div[data-test^='basket-lineitem-']"
+LINK_SELECTOR = "a[data-test='mms-router-link']"
+PRICE_SELECTORS = (
+    "div[data-test='mms-price'] span[aria-hidden='true']",
+    "div[data-test='mms-price'] span.sc-e0c7d9f7-0",
+)
+
+HTTP_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36"
+    ),
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "tr-TR,tr;q=0.9,en;q=0.8",
+}
+
+# Yalnızca Cloudflare challenge sayfalarında görülen işaretler. "challenge-platform"
+# normal sayfalardaki /cdn-cgi/challenge-platform/ script'lerinde de geçtiği için kullanılmaz.
+CHALLENGE_MARKERS = ("cf-chl-", "cf_chl_opt")
+CHALLENGE_TITLE = "Just a moment"
+CHALLENGE_STATUS_CODES = {403, 429, 503}
+
+
+class BasketFetchError(Exception):
+    """
+    HTTP ile sepet alınamadığında (challenge veya parse hatası) fırlatılır;
+    çağıran taraf tarayıcı yoluna düşer.
+    """
+
+
+def load_cookie_jar(cookies_file: str) -> httpx.Cookies:
+    """
+    Playwright formatındaki cookies.json dosyasını httpx çerez kavanozuna çevirir.
+    """
+    jar = httpx.Cookies()
+    if not os.path.exists(cookies_file):
+        return jar
+    try:
+        with open(cookies_file, "r", encoding="utf-8") as f:
+            for c in json.load(f):
+                jar.set(c["name"], c["value"], domain=c.get("domain", ""), path=c.get("path", "/"))
+    except Exception as e:
+        logger.warning("load_cookie_jar: Çerezler okunamadı: %s", e)
+        flush_logs()
+    return jar
+
+
+def is_challenge(status_code: int, html: str) -> bool:
+    """
+    Yanıtın Cloudflare challenge sayfası olup olmadığını durum kodu, başlık ve
+    challenge'a özgü işaretlerden anlar.
+    """
+    if status_code in CHALLENGE_STATUS_CODES:
+        return True
+    title = re.search(r"<title[^>]*>(.*?)</title>", html, re.IGNORECASE | re.DOTALL)
+    if title and CHALLENGE_TITLE in title.group(1):
+        return True
+    return any(m in html for m in CHALLENGE_MARKERS)
+
+
+def _has_price(txt: str) -> bool:
+    return txt.startswith("₺") and re.search(r"\d", txt) is not None
+
+
+def pick_image_url(src: str | None, data_src: str | None, srcset: str | None) -> str | None:
+    """
+    Sepet görselinin en büyük halini seçer: srcset'in son adayı, yoksa src/data-src.
+    Lazy-load yer tutucuları (data: URI) atlanır. EXTRACT_BASKET_JS'teki imageOf ile aynı mantık.
+    """
+    candidates = [c.strip().split(" ")[0] for c in (srcset or "").split(",") if c.strip()]
+    for url in (candidates[-1] if candidates else None, data_src, src):
+        if url and not url.startswith("data:"):
+            return url
+    return None
+
+
+def parse_basket_html(html: str) -> list[dict] | None:
+    """
+    Sunucu tarafında render edilmiş checkout HTML'inden sepet ürünlerini çıkarır.
+    EXTRACT_BASKET_JS ile aynı {href, price_text, image_url, line_item_id} yapısını döner.
+    Sepet konteyneri varsa ama içinde ürün yoksa boş liste, konteyner yoksa ya da ürün
+    satırları var ama hiçbiri okunamıyorsa None döner.
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    basket = soup.select_one(BASKET_SELECTOR)
+    if basket is None:
+        return None
+
+    line_items = basket.select(LINE_ITEM_SELECTOR)
+    items = []
+    for item in line_items:
+        link = item.select_one(LINK_SELECTOR)
+        if link is None or not link.get("href"):
+            continue
+        price_text = None
+        for sel in PRICE_SELECTORS:
+            for span in item.select(sel):
+                txt = span.get_text().strip()
+                if _has_price(txt):
+                    price_text = txt
+                    break
+            if price_text:
+                break
+        image_url = None
+        img = item.select_one("picture img") or item.select_one("img")
+        if img is not None:
+            image_url = pick_image_url(img.get("src"), img.get("data-src"), img.get("srcset"))
+        items.append({
+            "href": link["href"],
+            "price_text": price_text,
+            "image_url": image_url,
+            "line_item_id": item.get("data-test", "")[len("basket-lineitem-"):],
+        })
+    if line_items and not items:
+        return None
+    return items
+
+
+async def fetch_basket_items(client: httpx.AsyncClient, url: str) -> list[dict]:
+    """
+    Checkout sayfasını tarayıcı olmadan çeker ve sepet ürünlerini döner.
+    Challenge, parse hatası veya boş sepette BasketFetchError fırlatır.
+    """
+    try:
+        resp = await client.get(url)
+    except httpx.HTTPError as e:
+        raise BasketFetchError(f"istek hatası: {e}") from e
+
+    text = resp.text
+    if is_challenge(resp.status_code, text):
+        raise BasketFetchError(f"challenge algılandı (HTTP {resp.status_code})")
+    if resp.status_code != 200:
+        raise BasketFetchError(f"beklenmeyen durum kodu: HTTP {resp.status_code}")
+
+    items = parse_basket_html(text)
+    if items is None:
+        raise BasketFetchError("sepet HTML'den çıkarılamadı")
+    # Sepet JS ile doluyor ya da oturumsuz kabuk sayfa gelmiş olabilir; boş sonucu tarayıcı doğrular
+    if not items:
+        raise BasketFetchError("sepette ürün bulunamadı")
+    return items
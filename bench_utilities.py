@@ -0,0 +1,304 @@
+#!/usr/bin/env python
+# bench_utilities.py
+#
+# utilities.py'deki sıcak fonksiyonlar için mikro benchmark:
+#     python bench_utilities.py                  # ölç, baseline ile karşılaştır
+#     python bench_utilities.py --save-baseline  # mevcut sonuçları baseline olarak kaydet
+#
+# Korpus: "Yeni Metin Belgesi.txt" + --corpus ile verilen dosyalar + aşağıdaki
+# örnek URL'ler. Örnek URL'lerin ürün adları ve fiyat fonksiyonlarının çıktıları
+# burada sabit beklenen değerlerle karşılaştırılır. Baseline dosyası yalnızca makineye
+# özgü çağrı başı süreleri saklar. Çıktı farklıysa veya süre --threshold oranından
+# fazla artarsa çıkış kodu 1 olur.
+
+import os
+import sys
+import json
+import time
+import timeit
+import logging
+import argparse
+import platform
+
+import utilities
+from logconfig import logger
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CORPUS_FILES = [os.path.join(BASE_DIR, "Yeni Metin Belgesi.txt")]
+DEFAULT_BASELINE_FILE = os.path.join(BASE_DIR, "bench_baseline.json")
+
+# Katalogda olan ve olmayan ID'lerle, farklı kapasite yazımlarını kapsayan örnek URL'ler
+# ve beklenen ürün adları (optimizasyon öncesi uygulamanın çıktısı; değişirse bilerek güncellenir)
+SAMPLE_URL_CASES = [
+    (
+        "https://www.mediamarkt.com.tr/tr/product/_samsung-galaxy-s25-ultra-12gb-256gb-akilli-telefon-titanyum-siyah-sm-s938bzkdtur-1245636.html",
+        "Samsung Galaxy S25 Ultra 256 GB Titanyum Siyah",
+    ),
+    (
+        "https://www.mediamarkt.com.tr/tr/product/_samsung-galaxy-s25-ultra-12gb-1tb-akilli-telefon-titanyum-gri-sm-s938bztqtur-1243748.html",
+        "Samsung Galaxy S25 Ultra 1 TB Titanyum Gri",
+    ),
+    (
+        "https://www.mediamarkt.com.tr/tr/product/_samsung-galaxy-s24-fe-8gb-256gb-akilli-telefon-grafit-sm-s721bzkgtur-1240652.html",
+        "Samsung Galaxy S24 FE 256 GB Grafit",
+    ),
+    (
+        "https://www.mediamarkt.com.tr/tr/product/_samsung-galaxy-a56-8256-gb-akilli-telefon-grafit-sm-a566bzkatur-1245807.html",
+        "Samsung Galaxy A56 256 GB Grafit",
+    ),
+    (
+        "https://www.mediamarkt.com.tr/tr/product/_samsung-galaxy-a25-6128-gb-akilli-telefon-mavi-sm-a256blbdtur-1236000.html",
+        "Samsung Galaxy A25 128 GB Mavi Sm A256BLBDTUR",
+    ),
+    (
+        "https://www.mediamarkt.com.tr/tr/product/_samsung-galaxy-a55-8gb256gb-akilli-telefon-lacivert-sm-a556bzkatur-1236158.html",
+        "Samsung Galaxy A55 256 GB Lacivert Sm A556BZKATUR",
+    ),
+    (
+        "https://www.mediamarkt.com.tr/tr/product/_samsung-galaxy-s25-plus-12gb-512gb-akilli-telefon-mint-yesil-1243999.html",
+        "Samsung Galaxy S25 Plus 12 GB 512 GB Mint Yeşili",
+    ),
+    (
+        "https://www.mediamarkt.com.tr/tr/product/_samsung-galaxy-s24-ultra-121tb-akilli-telefon-titanyum-siyah-1235999.html",
+        "Samsung Galaxy S24 Ultra 1 TB Titan Siyah",
+    ),
+    (
+        "https://www.mediamarkt.com.tr/tr/product/_xiaomi-14t-12512-gb-akilli-telefon-titan-siyahi-1240640.html",
+        "Xiaomi 14T Pro 512 GB Titan Siyahı",
+    ),
+    (
+        "https://www.mediamarkt.com.tr/tr/product/_xiaomi-14t-12256-gb-akilli-telefon-mavi-1240999.html",
+        "Xiaomi 14T 256 GB Titan Mavisi",
+    ),
+    (
+        "https://www.mediamarkt.com.tr/tr/product/_xiaomi-redmi-note-14-pro-8256-gb-akilli-telefon-mor-1243776.html",
+        "Xiaomi Redmi Note 14 Pro 256 GB 8 GB Mor",
+    ),
+    (
+        "https://www.mediamarkt.com.tr/tr/product/_xiaomi-redmi-note-14-pro-5g-12512-gb-akilli-telefon-yesil-1243999.html",
+        "Xiaomi Redmi Note 14 Pro 5G 512 GB Yeşil",
+    ),
+    (
+        "https://www.mediamarkt.com.tr/tr/product/_xiaomi-redmi-14c-8256-gb-akilli-telefon-yesil-1241998.html",
+        "Xiaomi Redmi 14C 256 GB 8 GB Yeşil",
+    ),
+    (
+        "https://www.mediamarkt.com.tr/tr/product/_xiaomi-redmi-13-8256-gb-akilli-telefon-altin-1237999.html",
+        "Xiaomi Redmi 13 256 GB Altın",
+    ),
+    (
+        "https://www.mediamarkt.com.tr/tr/product/_poco-x6-pro-12512-gb-akilli-telefon-sari-1238999.html",
+        "Poco X6 Pro 512 GB Sarı",
+    ),
+    (
+        "https://www.mediamarkt.com.tr/tr/product/_oppo-reno-13-pro-12512-gb-akilli-telefon-grafit-1245685.html",
+        "Oppo Reno 13 Pro 512 GB Grafit",
+    ),
+    (
+        "https://www.mediamarkt.com.tr/tr/product/_oppo-a60-8256-gb-akilli-telefon-mor-1238999.html",
+        "Oppo A60 256 GB Mor",
+    ),
+    (
+        "https://www.mediamarkt.com.tr/tr/product/_realme-c75-8256-gb-akilli-telefon-sari-rmx3941-1244663.html",
+        "Realme C75 256 GB Sarı",
+    ),
+    (
+        "https://www.mediamarkt.com.tr/tr/product/_realme-12-pro-plus-12512-gb-akilli-telefon-mavi-rmx3840-1236999.html",
+        "Realme 12 Pro Plus 512 GB Mavi",
+    ),
+    (
+        "https://www.mediamarkt.com.tr/tr/product/_apple-iphone-16-pro-max-256gb-akilli-telefon-col-titanyum-mywx3tua-1239591.html",
+        "iPhone 16 Pro Max 256 GB Çöl Titanyum",
+    ),
+    (
+        "https://www.mediamarkt.com.tr/tr/product/_apple-iphone-16e-128gb-akilli-telefon-beyaz-md1q4tua-1244799.html",
+        "Apple Iphone 16e 128 GB Beyaz MD1Q4TUA",
+    ),
+    (
+        "https://www.mediamarkt.com.tr/tr/product/_apple-iphone-13-128-gb-akilli-telefon-gece-yarisi-mlpf3tua-1217606.html",
+        "iPhone 13 128 GB Gece Yarısı",
+    ),
+    (
+        "https://www.mediamarkt.com.tr/tr/product/_honor-200-12512-gb-akilli-telefon-antrasit-1241999.html",
+        "Honor 200 512 GB Grafit",
+    ),
+]
+SAMPLE_URLS = [case[0] for case in SAMPLE_URL_CASES]
+
+# (girdi, beklenen çıktı)
+CLEAN_PRICE_CASES = [
+    ("₺12.999,00", 12999.0),
+    ("₺1.234,56", 1234.56),
+    ("64.999,– TL", 64999.0),
+    ("999", 999.0),
+    ("Price Not Specified", 0.0),
+]
+FORMAT_PRICE_CASES = [
+    (12999.0, "12.999,00 TL"),
+    (1234.56, "1.234,56 TL"),
+    (0.5, "0,50 TL"),
+    (1000000.0, "1.000.000,00 TL"),
+]
+
+BRAND_ADJUSTERS = [
+    ("adjust_samsung_product_name", "samsung"),
+    ("adjust_xiaomi_product_name", "xiaomi"),
+    ("adjust_oppo_product_name", "oppo"),
+    ("adjust_realme_product_name", "realme"),
+    ("adjust_apple_product_name", "apple"),
+]
+
+
+def load_corpus(paths) -> list[str]:
+    urls = []
+    for path in paths:
+        if not os.path.exists(path):
+            logger.warning("bench_utilities: Korpus dosyası bulunamadı: %s", path)
+            continue
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            urls.extend(line.strip() for line in f if line.strip().startswith("http"))
+    urls.extend(SAMPLE_URLS)
+    return list(dict.fromkeys(urls))
+
+
+def measure(func, repeat: int, min_time: float) -> float:
+    """
+    func'ı (argümansız) her ölçüm en az min_time sürecek kadar döngüde çalıştırır;
+    repeat tekrarın en iyisinden bir çalıştırmanın süresini (sn) döner.
+    """
+    timer = timeit.Timer(func)
+    number, elapsed = timer.autorange()
+    while elapsed < min_time:
+        number *= 2
+        elapsed = timer.timeit(number)
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def build_benchmarks(urls: list[str]) -> dict:
+    """
+    Her benchmark argümansız bir fonksiyondur; korpusun tamamını bir kez işler
+    ve sonuç korpus uzunluğuna bölünerek çağrı başına çevrilir.
+    """
+    extract = utilities.extract_product_name_from_url
+    normalize = utilities.normalize_product_name_from_url
+    prices = [case[0] for case in CLEAN_PRICE_CASES]
+    values = [case[0] for case in FORMAT_PRICE_CASES]
+
+    def extract_cold():
+        normalize.cache_clear()
+        for url in urls:
+            extract(url)
+
+    def extract_warm():
+        for url in urls:
+            extract(url)
+
+    benches = {
+        "extract_product_name_from_url[cold]": (extract_cold, len(urls)),
+        "extract_product_name_from_url[warm]": (extract_warm, len(urls)),
+        "extract_product_id": (lambda: [utilities.extract_product_id(u) for u in urls], len(urls)),
+        "clean_price": (lambda: [utilities.clean_price(p) for p in prices], len(prices)),
+        "format_price_to_user_friendly": (lambda: [utilities.format_price_to_user_friendly(v) for v in values], len(values)),
+    }
+    for func_name, brand in BRAND_ADJUSTERS:
+        func = getattr(utilities, func_name)
+        brand_urls = [u for u in urls if brand in u.lower()] or urls
+        benches[func_name] = (
+            lambda func=func, brand_urls=brand_urls: [func("Ürün Adı 256 GB", u) for u in brand_urls],
+            len(brand_urls)
+        )
+    return benches
+
+
+def run_benchmarks(urls: list[str], repeat: int, min_time: float) -> dict:
+    results = {}
+    for name, (func, calls) in build_benchmarks(urls).items():
+        ns = measure(func, repeat, min_time) * 1e9 / calls
+        results[name] = {"ns_per_call": round(ns, 1), "calls_per_sec": round(1e9 / ns, 1) if ns else 0.0}
+    return results
+
+
+def check_outputs() -> list[str]:
+    """
+    Fiyat fonksiyonlarını ve örnek URL adlarını sabit beklenen değerlerle
+    karşılaştırır; uyuşmazlıkların listesini döner.
+    """
+    errors = []
+    for text, expected in CLEAN_PRICE_CASES:
+        got = utilities.clean_price(text)[0]
+        if abs(got - expected) > 1e-9:
+            errors.append(f"clean_price({text!r}) = {got!r}, beklenen {expected!r}")
+    for value, expected in FORMAT_PRICE_CASES:
+        got = utilities.format_price_to_user_friendly(value)
+        if got != expected:
+            errors.append(f"format_price_to_user_friendly({value!r}) = {got!r}, beklenen {expected!r}")
+    for url, expected in SAMPLE_URL_CASES:
+        got = utilities.extract_product_name_from_url(url)
+        if got != expected:
+            errors.append(f"extract_product_name_from_url({url}) = {got!r}, beklenen {expected!r}")
+    return errors
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    regressions = []
+    for name, r in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        ratio = r["ns_per_call"] / base["ns_per_call"] if base["ns_per_call"] else 1.0
+        if ratio > 1.0 + threshold:
+            regressions.append(
+                f"{name}: {r['ns_per_call']:.1f} ns/çağrı, baseline {base['ns_per_call']:.1f} ns/çağrı (x{ratio:.2f})"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="utilities.py sıcak fonksiyonları için mikro benchmark.")
+    parser.add_argument("--corpus", action="append", default=[], help="ek URL korpus dosyası (satır başına bir URL)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_FILE, help="baseline JSON dosyası")
+    parser.add_argument("--save-baseline", action="store_true", help="süreleri baseline olarak kaydet")
+    parser.add_argument("--threshold", type=float, default=0.25, help="izin verilen yavaşlama oranı (0.25 = %%25)")
+    parser.add_argument("--repeat", type=int, default=5, help="ölçüm tekrar sayısı (en iyisi alınır)")
+    parser.add_argument("--min-time", type=float, default=0.2, help="tek ölçümün en kısa süresi (sn)")
+    parser.add_argument("--log-level", default="CRITICAL", help="benchmark sırasında logger seviyesi")
+    args = parser.parse_args()
+
+    logger.setLevel(getattr(logging, args.log_level.upper(), logging.CRITICAL))
+    urls = load_corpus(DEFAULT_CORPUS_FILES + args.corpus)
+
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    errors = check_outputs()
+    results = run_benchmarks(urls, args.repeat, args.min_time)
+
+    print(f"Korpus: {len(urls)} URL, Python {platform.python_version()}")
+    print(f"{'benchmark':<42} {'ns/çağrı':>12} {'çağrı/sn':>14}")
+    for name, r in results.items():
+        print(f"{name:<42} {r['ns_per_call']:>12.1f} {r['calls_per_sec']:>14.1f}")
+
+    if args.save_baseline:
+        data = {
+            "created": time.strftime('%Y-%m-%d %H:%M:%S'),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "results": results,
+        }
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=4)
+        print(f"Baseline kaydedildi: {args.baseline}")
+
+    regressions = compare(results, baseline.get("results", {}), args.threshold)
+    for line in errors:
+        print(f"HATALI ÇIKTI: {line}")
+    for line in regressions:
+        print(f"YAVAŞLAMA: {line}")
+    if errors or regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
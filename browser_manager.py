@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+# browser_manager.py
+
+import os
+import json
+import asyncio
+from contextlib import asynccontextmanager
+from playwright.async_api import async_playwright
+
+from logconfig import logger, flush_logs
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+COOKIES_FILE = "cookies.json"
+BROWSER_CONTEXT_MAX_USES = int(os.getenv("BROWSER_CONTEXT_MAX_USES", "50"))
+BROWSER_MAX_USES = int(os.getenv("BROWSER_MAX_USES", "500"))
+BROWSER_MAX_RSS_MB = float(os.getenv("BROWSER_MAX_RSS_MB", "1500"))
+
+# Scrape sırasında indirilmesine gerek olmayan kaynak türleri
+BLOCKED_RESOURCE_TYPES = {
+    "image", "media", "font", "iframe", "track", "analytics", "pixel", "tag", "facebook", "doubleclick"
+}
+
+
+async def _route_handler(route, request):
+    if request.resource_type in BLOCKED_RESOURCE_TYPES:
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+class BrowserManager:
+    """
+    Chromium'u scrape döngüleri boyunca açık tutar ve proxy başına sıcak
+    context'ler dağıtır. Context N kullanımda, tarayıcı N kullanımda veya
+    RSS limiti aşıldığında yenilenir; çöken tarayıcı bir sonraki istekte yeniden başlatılır.
+    Aynı context'i aynı anda birden fazla görev kullanabilir (ör. sepet ve görsel worker'ları);
+    emekliye ayrılan context/tarayıcı yeni isteklere verilmez, son kullanıcısı çıkınca kapatılır.
+    """
+
+    def __init__(
+        self,
+        headless: bool = True,
+        cookies_file: str = COOKIES_FILE,
+        context_max_uses: int = BROWSER_CONTEXT_MAX_USES,
+        browser_max_uses: int = BROWSER_MAX_USES,
+        max_rss_mb: float = BROWSER_MAX_RSS_MB
+    ):
+        self.headless = headless
+        self.cookies_file = cookies_file
+        self.context_max_uses = context_max_uses
+        self.browser_max_uses = browser_max_uses
+        self.max_rss_mb = max_rss_mb
+        self._playwright = None
+        self._browser = None
+        self._browser_uses = 0
+        # proxy anahtarı -> [context, kullanım sayısı, aktif kullanıcı, tarayıcı]
+        self._contexts = {}
+        # tarayıcı -> aktif kullanıcı sayısı (emekli tarayıcılar dahil)
+        self._browser_holders = {}
+        self._retired_browsers = set()
+        self._cookies = None
+        self._cookies_mtime = None
+        self._lock = asyncio.Lock()
+
+    def _load_cookies(self):
+        """
+        Çerez dosyasını yalnızca değiştiğinde (ör. yeniden login sonrası) tekrar okur.
+        """
+        try:
+            mtime = os.path.getmtime(self.cookies_file)
+        except OSError:
+            return None
+        if mtime != self._cookies_mtime:
+            with open(self.cookies_file, "r", encoding="utf-8") as f:
+                self._cookies = json.load(f)
+            self._cookies_mtime = mtime
+            logger.info("BrowserManager: Çerezler yüklendi: %s", self.cookies_file)
+            flush_logs()
+        return self._cookies
+
+    def _browser_rss_mb(self) -> float | None:
+        if psutil is None:
+            return None
+        total = 0
+        try:
+            for child in psutil.Process().children(recursive=True):
+                try:
+                    name = child.name().lower()
+                    if "chrom" in name or "headless" in name:
+                        total += child.memory_info().rss
+                except (psutil.NoSuchProcess, psutil.AccessDenied):
+                    continue
+        except psutil.Error:
+            return None
+        return total / (1024 * 1024)
+
+    async def _close_quietly(self, obj):
+        try:
+            await obj.close()
+        except Exception:
+            pass
+
+    async def _close_browser(self):
+        """
+        Tarayıcıyı ve context'lerini kullanımda olsalar da hemen kapatır (çökme ve kapanış için).
+        """
+        for ctx, *_ in self._contexts.values():
+            await self._close_quietly(ctx)
+        self._contexts.clear()
+        if self._browser is not None:
+            await self._close_quietly(self._browser)
+            self._browser_holders.pop(self._browser, None)
+            self._browser = None
+        self._browser_uses = 0
+
+    async def _retire_browser(self):
+        """
+        Tarayıcıyı yeni isteklere kapatır; kullanılmayan context'leri hemen, kullanılanları
+        ve tarayıcının kendisini son kullanıcı çıkınca kapatır.
+        """
+        browser = self._browser
+        for entry in self._contexts.values():
+            if entry[2] == 0:
+                await self._close_quietly(entry[0])
+        self._contexts.clear()
+        self._browser = None
+        self._browser_uses = 0
+        if self._browser_holders.get(browser, 0) > 0:
+            self._retired_browsers.add(browser)
+        else:
+            self._browser_holders.pop(browser, None)
+            await self._close_quietly(browser)
+
+    async def _ensure_browser(self):
+        if self._browser is not None:
+            if self._browser.is_connected():
+                recycle = None
+                if self._browser_uses >= self.browser_max_uses:
+                    recycle = f"{self._browser_uses} kullanım"
+                else:
+                    rss = self._browser_rss_mb()
+                    if rss is not None and rss > self.max_rss_mb:
+                        recycle = f"RSS {rss:.0f} MB"
+                if recycle is None:
+                    return
+                logger.info("BrowserManager: Tarayıcı yenileniyor (%s).", recycle)
+                flush_logs()
+                await self._retire_browser()
+            else:
+                logger.warning("BrowserManager: Tarayıcı bağlantısı kopmuş, yeniden başlatılıyor.")
+                flush_logs()
+                await self._close_browser()
+
+        if self._playwright is None:
+            self._playwright = await async_playwright().start()
+        self._browser = await self._playwright.chromium.launch(headless=self.headless)
+        logger.info("BrowserManager: Chromium başlatıldı.")
+        flush_logs()
+
+    async def _new_context(self, proxy_cfg):
+        if proxy_cfg:
+            ctx = await self._browser.new_context(proxy=proxy_cfg)
+        else:
+            ctx = await self._browser.new_context()
+        cookies = self._load_cookies()
+        if cookies:
+            await ctx.add_cookies(cookies)
+        await ctx.route("**/*", _route_handler)
+        logger.info("BrowserManager: Yeni context hazır (proxy: %s).",
+                    proxy_cfg["server"] if proxy_cfg else "yok")
+        flush_logs()
+        return ctx
+
+    @asynccontextmanager
+    async def context(self, proxy_cfg: dict = None):
+        """
+        Verilen proxy için sıcak bir browser context'i sağlar.
+        Kullanım sınırına ulaşan context yeni isteklere verilmez; son kullanıcısı çıkınca kapatılır.
+        """
+        key = proxy_cfg["server"] if proxy_cfg else ""
+        async with self._lock:
+            await self._ensure_browser()
+            entry = self._contexts.get(key)
+            if entry is None:
+                entry = self._contexts[key] = [await self._new_context(proxy_cfg), 0, 0, self._browser]
+            entry[1] += 1
+            entry[2] += 1
+            browser = entry[3]
+            self._browser_holders[browser] = self._browser_holders.get(browser, 0) + 1
+            self._browser_uses += 1
+            if entry[1] >= self.context_max_uses:
+                del self._contexts[key]
+        ctx = entry[0]
+        try:
+            yield ctx
+        finally:
+            entry[2] -= 1
+            # Çöken/kapatılan tarayıcının sayacı _close_browser'da silinmiş olabilir
+            if browser in self._browser_holders:
+                self._browser_holders[browser] -= 1
+            if entry[2] == 0 and self._contexts.get(key) is not entry:
+                await self._close_quietly(ctx)
+                logger.info("BrowserManager: Context %d kullanımdan sonra kapatıldı.", entry[1])
+                flush_logs()
+            if browser in self._retired_browsers and self._browser_holders.get(browser) == 0:
+                self._retired_browsers.discard(browser)
+                del self._browser_holders[browser]
+                await self._close_quietly(browser)
+                logger.info("BrowserManager: Emekli tarayıcı kapatıldı.")
+                flush_logs()
+
+    async def close(self):
+        async with self._lock:
+            await self._close_browser()
+            for browser in self._retired_browsers:
+                await self._close_quietly(browser)
+            self._retired_browsers.clear()
+            self._browser_holders.clear()
+            if self._playwright is not None:
+                await self._playwright.stop()
+                self._playwright = None
+        logger.info("BrowserManager: Kapatıldı.")
+        flush_logs()
+
+
+browser_manager = BrowserManager()
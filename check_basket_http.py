@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+# check_basket_http.py
+#
+# basket_http.py'nin yerel sahte sunucuya (httpx.MockTransport) karşı kontrolü:
+#     python check_basket_http.py
+#
+# Sepet sayfası, boş sepet, Cloudflare'in normal sayfalara eklediği script,
+# challenge sayfaları ve konteynersiz sayfa için fetch_basket_items sonucunu ve
+# scrape_basket_http'in challenge ve boş sepette tarayıcıya düşüp düşmediğini kontrol eder.
+# Hata varsa çıkış kodu 1 olur.
+
+import sys
+import asyncio
+import logging
+
+import httpx
+
+from logconfig import logger
+from basket_http import BasketFetchError, fetch_basket_items
+
+CHECKOUT_URL = "https://www.mediamarkt.com.tr/checkout"
+
+BASKET_HTML = """
+<html><head><title>Sepetim | MediaMarkt</title>
+<script src="/cdn-cgi/challenge-platform/scripts/jsd/main.js"></script></head>
+<body><div data-test="mms-seller-basket">
+  <div data-test="basket-lineitem-111">
+    <a data-test="mms-router-link" href="/tr/product/_apple-iphone-16e-128gb-akilli-telefon-beyaz-md1q4tua-1244799.html">iPhone</a>
+    <div data-test="mms-price"><span aria-hidden="true">₺32.999,00</span></div>
+    <picture><img src="data:image/gif;base64,R0lG" srcset="https://assets.mmsrg.com/a.jpg 1x, https://assets.mmsrg.com/a@2x.jpg 2x"></picture>
+  </div>
+  <div data-test="basket-lineitem-222">
+    <a data-test="mms-router-link" href="/tr/product/_oppo-a60-8256-gb-akilli-telefon-mor-1238999.html">Oppo</a>
+    <div data-test="mms-price"><span aria-hidden="true">Fiyat yok</span></div>
+  </div>
+</div></body></html>
+"""
+
+EMPTY_BASKET_HTML = """
+<html><head><title>Sepetim | MediaMarkt</title></head>
+<body><div data-test="mms-seller-basket"><p>Sepetiniz boş</p></div></body></html>
+"""
+
+CHALLENGE_HTML = """
+<html><head><title>Just a moment...</title></head>
+<body><script>window._cf_chl_opt={cType:'managed'};</script></body></html>
+"""
+
+NO_BASKET_HTML = "<html><head><title>Giriş yap</title></head><body><form></form></body></html>"
+
+EXPECTED_BASKET = [
+    {
+        "href": "/tr/product/_apple-iphone-16e-128gb-akilli-telefon-beyaz-md1q4tua-1244799.html",
+        "price_text": "₺32.999,00",
+        "image_url": "https://assets.mmsrg.com/a@2x.jpg",
+        "line_item_id": "111",
+    },
+    {
+        "href": "/tr/product/_oppo-a60-8256-gb-akilli-telefon-mor-1238999.html",
+        "price_text": None,
+        "image_url": None,
+        "line_item_id": "222",
+    },
+]
+
+# (ad, durum kodu, HTML, beklenen öğeler; None = BasketFetchError beklenir)
+CASES = [
+    ("sepet", 200, BASKET_HTML, EXPECTED_BASKET),
+    ("boş sepet", 200, EMPTY_BASKET_HTML, None),
+    ("challenge sayfası (200)", 200, CHALLENGE_HTML, None),
+    ("challenge durum kodu", 403, BASKET_HTML, None),
+    ("konteyner yok", 200, NO_BASKET_HTML, None),
+    ("sunucu hatası", 500, BASKET_HTML, None),
+]
+
+
+def mock_client(status_code: int, html: str) -> httpx.AsyncClient:
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(status_code, text=html, headers={"Content-Type": "text/html; charset=utf-8"})
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+async def check_fetch() -> list[str]:
+    errors = []
+    for name, status_code, html, expected in CASES:
+        async with mock_client(status_code, html) as client:
+            try:
+                items = await fetch_basket_items(client, CHECKOUT_URL)
+            except BasketFetchError as e:
+                items = None
+                detail = str(e)
+            else:
+                detail = f"{len(items)} ürün"
+        ok = items == expected
+        print(f"{'OK ' if ok else 'HATA'} {name:<28} {detail}")
+        if not ok:
+            errors.append(f"{name}: beklenen {expected!r}, gelen {items!r}")
+    return errors
+
+
+async def check_fallback() -> list[str]:
+    """
+    Challenge ve boş sepet yanıtında scrape_basket_http False dönmeli (çağıran Playwright'a düşer).
+    """
+    from medios_iki import scrape_basket_http
+
+    errors = []
+    for name, html in (("challenge", CHALLENGE_HTML), ("boş sepet", EMPTY_BASKET_HTML)):
+        async with mock_client(200, html) as client:
+            handled = await scrape_basket_http(client, CHECKOUT_URL, None, asyncio.Queue(), asyncio.Queue(), {})
+        label = f"tarayıcıya düşme ({name})"
+        print(f"{'OK ' if not handled else 'HATA'} {label:<28} scrape_basket_http -> {handled}")
+        if handled:
+            errors.append(f"{label}: True döndü")
+    return errors
+
+
+async def main() -> int:
+    logger.setLevel(logging.CRITICAL)
+    errors = await check_fetch()
+    errors += await check_fallback()
+    for error in errors:
+        print(error, file=sys.stderr)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
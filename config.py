@@ -50,10 +50,19 @@ DATABASE_CONFIG = {
     'db': os.getenv("DB_NAME"),
     'host': os.getenv("DB_HOST"),
     'port': int(os.getenv("DB_PORT", "3306")),
-    'minsize': 80,
-    'maxsize': 150
+    # Paylaşılan pool küçük başlar, talep oldukça maxsize'a kadar büyür (bkz. db_pool.py)
+    'minsize': int(os.getenv("DB_POOL_MINSIZE", "2")),
+    'maxsize': int(os.getenv("DB_POOL_MAXSIZE", "30"))
 }
 
+# products şema sürümü: 1 = product_link anahtarlı eski tablo, 2 = product_id anahtarlı products_v2
+try:
+    PRODUCTS_SCHEMA_VERSION = int(os.getenv("PRODUCTS_SCHEMA_VERSION", "1"))
+except ValueError:
+    logger.warning("PRODUCTS_SCHEMA_VERSION geçersiz; varsayılan 1 kullanılıyor.")
+    PRODUCTS_SCHEMA_VERSION = 1
+PRODUCTS_TABLE = "products_v2" if PRODUCTS_SCHEMA_VERSION >= 2 else "products"
+
 MEDIA_LOGIN_EMAIL = os.getenv("MEDIA_LOGIN_EMAIL")
 MEDIA_LOGIN_PASSWORD = os.getenv("MEDIA_LOGIN_PASSWORD")
 
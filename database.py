@@ -1,18 +1,25 @@
 from dependencies import *
 from logconfig import logger, flush_logs  
+import os
 import time
 import asyncio
 import aiomysql
-from config import DATABASE_CONFIG
+from config import DATABASE_CONFIG, PRODUCTS_SCHEMA_VERSION, PRODUCTS_TABLE
+from product_snapshot import product_snapshot
+from db_pool import shared_pool
+from price_history import create_price_history_table, record_price_transitions
+from metrics import metrics
+from notify_dedupe import notified_prices
 warnings.filterwarnings("ignore", message=".*already exists")
 warnings.filterwarnings("ignore", message=".*Can't create database .*; database exists")
 async def create_pool():
+    """
+    Süreç genelinde paylaşılan pool'u döner; ilk çağrıda oluşturulur.
+    Kapatma yalnızca kapanışta (repeated_scrape) yapılır.
+    """
     try:
-        logger.info("create_pool: Creating database connection pool...")
-        flush_logs()
-        pool = await aiomysql.create_pool(**DATABASE_CONFIG)
-        logger.info("create_pool: Connection pool created successfully.")
-        flush_logs()
+        pool = await shared_pool.start()
+        logger.debug("create_pool: Shared connection pool ready: %s", pool.stats())
         return pool
     except Exception as e:
         logger.error("create_pool: Error occurred: %s", e)
@@ -50,77 +57,300 @@ async def create_database():
     except Exception as e:
         logger.error("create_database: Error occurred: %s", e)
         flush_logs()
+PRODUCTS_V1_DDL = """
+    CREATE TABLE IF NOT EXISTS products (
+        product_link VARCHAR(500) UNIQUE,
+        product_name VARCHAR(255),
+        product_price REAL,
+        first_seen_date TEXT,
+        last_update_date TEXT,
+        image_url VARCHAR(1000) NULL,
+        INDEX idx_product_name (product_name)
+    )
+"""
+
+# v2: MediaMarkt URL'sinin sonundaki sayısal ID birincil anahtar,
+# fiyat DECIMAL, tarihler DATETIME (index'lenebilir)
+PRODUCTS_V2_DDL = """
+    CREATE TABLE IF NOT EXISTS products_v2 (
+        product_id INT UNSIGNED NOT NULL PRIMARY KEY,
+        product_link VARCHAR(500) NOT NULL,
+        product_name VARCHAR(255),
+        product_price DECIMAL(12, 2),
+        first_seen_date DATETIME NOT NULL,
+        last_update_date DATETIME NOT NULL,
+        image_url VARCHAR(1000) NULL,
+        INDEX idx_product_name (product_name),
+        INDEX idx_last_update_date (last_update_date)
+    ) ENGINE=InnoDB
+"""
+
+async def add_image_url_column(cur, table: str) -> bool:
+    """
+    Tabloda image_url sütunu yoksa ekler; eklendiyse True döner (commit çağırana aittir).
+    """
+    await cur.execute("""
+        SELECT COUNT(*) FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = 'image_url'
+    """, (table,))
+    if (await cur.fetchone())[0]:
+        return False
+    await cur.execute(f"ALTER TABLE {table} ADD COLUMN image_url VARCHAR(1000) NULL")
+    logger.info("add_image_url_column: '%s' tablosuna image_url sütunu eklendi.", table)
+    flush_logs()
+    return True
+
+async def ensure_image_url_column(pool):
+    """
+    image_url sütunu eklenmeden önce oluşturulmuş tabloya sütunu ekler.
+    """
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            if await add_image_url_column(cur, PRODUCTS_TABLE):
+                await conn.commit()
+
 async def create_table(pool):
     try:
-        logger.info("create_table: Creating 'products' table...")
+        logger.info("create_table: Creating '%s' table...", PRODUCTS_TABLE)
         flush_logs()
         async with pool.acquire() as conn:
             async with conn.cursor() as cur:
-                await cur.execute("""
-                    CREATE TABLE IF NOT EXISTS products (
-                        product_link VARCHAR(500) UNIQUE,
-                        product_name VARCHAR(255),
-                        product_price REAL,
-                        first_seen_date TEXT,
-                        last_update_date TEXT,
-                        INDEX idx_product_link (product_link),
-                        INDEX idx_product_name (product_name)
-                    )
-                """)
+                await cur.execute(PRODUCTS_V2_DDL if PRODUCTS_SCHEMA_VERSION >= 2 else PRODUCTS_V1_DDL)
                 await conn.commit()
-        logger.info("create_table: 'products' table created successfully.")
+        await ensure_image_url_column(pool)
+        logger.info("create_table: '%s' table created successfully.", PRODUCTS_TABLE)
         flush_logs()
     except Exception as e:
         logger.error("create_table: Error occurred: %s", e)
         flush_logs()
-async def db_bulk_worker(pool, db_update_queue, flush_interval=1.0, batch_size=100):
+    await create_price_history_table(pool)
+DB_QUEUE_MAXSIZE = int(os.getenv("DB_QUEUE_MAXSIZE", "5000"))
+# Fiyatı değişmeyen ürünlerin "görülme" zamanı bu aralıkla toplu yazılır
+SEEN_FLUSH_INTERVAL = float(os.getenv("SEEN_FLUSH_INTERVAL", "60"))
+SEEN_FLUSH_CHUNK = 1000
+
+# db_bulk_worker'ın son durumu; metrik ve teşhis için okunur
+db_worker_stats = {
+    "batches": 0,
+    "items": 0,
+    "errors": 0,
+    "seen_flushed": 0,
+    "last_batch_size": 0,
+    "last_batch_latency": 0.0,
+    "queue_depth": 0,
+}
+
+async def _collect_batch(db_update_queue, batch, flush_interval, batch_size):
+    """
+    İlk öğeyi bekler; ardından batch_size dolana veya flush_interval geçene
+    kadar (hangisi önce olursa) kuyruğu bloklayarak okur. Öğeler verilen
+    listeye eklenir, böylece iptal anında toplananlar kaybolmaz.
+    """
+    loop = asyncio.get_running_loop()
+    batch.append(await db_update_queue.get())
+    deadline = loop.time() + flush_interval
+    while len(batch) < batch_size:
+        try:
+            batch.append(db_update_queue.get_nowait())
+            continue
+        except asyncio.QueueEmpty:
+            pass
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            break
+        # wait_for yerine wait: iç get ile aynı anda gelen iptal yutulmasın
+        getter = asyncio.ensure_future(db_update_queue.get())
+        try:
+            done, _ = await asyncio.wait({getter}, timeout=remaining)
+        finally:
+            if getter.done() and not getter.cancelled():
+                batch.append(getter.result())
+            else:
+                getter.cancel()
+        if not done:
+            break
+
+def _split_seen(items, pending_seen):
+    """
+    Fiyatı değişmemiş ("seen") kayıtları pending_seen'e toplar, gerçek
+    değişiklikleri (insert/update) liste olarak döner.
+    """
+    changes = []
+    for item in items:
+        if item.get('is_seen', False):
+            pending_seen[item['product_link']] = item
+        else:
+            changes.append(item)
+    return changes
+
+async def _flush_seen(pool, pending_seen):
+    """
+    Fiyatı değişmeyen ürünlerin last_update_date'ini tek bir toplu UPDATE ile tazeler.
+    """
+    if not pending_seen:
+        return
+    if PRODUCTS_SCHEMA_VERSION >= 2:
+        key_column = "product_id"
+        keys = [item['product_id'] for item in pending_seen.values() if item.get('product_id')]
+    else:
+        key_column = "product_link"
+        keys = list(pending_seen)
+    now = max(item['now'] for item in pending_seen.values())
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            for i in range(0, len(keys), SEEN_FLUSH_CHUNK):
+                chunk = keys[i:i + SEEN_FLUSH_CHUNK]
+                placeholders = ", ".join(["%s"] * len(chunk))
+                await cur.execute(
+                    f"UPDATE {PRODUCTS_TABLE} SET last_update_date = %s WHERE {key_column} IN ({placeholders})",
+                    [now, *chunk]
+                )
+            await conn.commit()
+    logger.debug("db_bulk_worker: %d değişmeyen ürünün görülme zamanı tazelendi.", len(keys))
+    db_worker_stats["seen_flushed"] += len(keys)
+    pending_seen.clear()
+
+async def _write_batch(pool, batch):
+    if not batch:
+        return
+    inserts = [item for item in batch if not item.get('is_update', False)]
+    updates = [item for item in batch if item.get('is_update', False)]
+    with metrics.timer("db_commit"):
+        async with pool.acquire() as conn:
+            async with conn.cursor() as cur:
+                if PRODUCTS_SCHEMA_VERSION >= 2:
+                    await _write_rows_v2(cur, inserts, updates)
+                else:
+                    await _write_rows_v1(cur, inserts, updates)
+                await record_price_transitions(cur, batch)
+                await conn.commit()
+    product_snapshot.apply(batch)
+
+async def _write_rows_v1(cur, inserts, updates):
+    if inserts:
+        logger.debug("db_bulk_worker: Executing insert for %d records.", len(inserts))
+        query = """
+        INSERT INTO products (product_link, product_name, product_price, first_seen_date, last_update_date, image_url)
+        VALUES (%s, %s, %s, %s, %s, %s) AS new
+        ON DUPLICATE KEY UPDATE 
+            product_price = new.product_price,
+            last_update_date = new.last_update_date,
+            image_url = COALESCE(new.image_url, products.image_url)
+        """
+        data = [
+            (item['product_link'], item['product_name'], item['product_price'], item['now'], item['now'],
+             item.get('image_url'))
+            for item in inserts
+        ]
+        await cur.executemany(query, data)
+    if updates:
+        logger.debug("db_bulk_worker: Executing update for %d records.", len(updates))
+        query = """
+        UPDATE products SET product_price = %s, last_update_date = %s, image_url = COALESCE(%s, image_url)
+        WHERE product_link = %s
+        """
+        data = [
+            (item['product_price'], item['now'], item.get('image_url'), item['product_link'])
+            for item in updates
+        ]
+        await cur.executemany(query, data)
+
+async def _write_rows_v2(cur, inserts, updates):
+    missing = [item['product_link'] for item in inserts + updates if not item.get('product_id')]
+    if missing:
+        logger.warning("db_bulk_worker: Ürün ID'si çıkarılamayan %d kayıt atlandı: %s", len(missing), missing[:3])
+    if inserts:
+        logger.debug("db_bulk_worker: Executing insert for %d records.", len(inserts))
+        query = """
+        INSERT INTO products_v2 (product_id, product_link, product_name, product_price, first_seen_date, last_update_date, image_url)
+        VALUES (%s, %s, %s, %s, %s, %s, %s) AS new
+        ON DUPLICATE KEY UPDATE
+            product_link = new.product_link,
+            product_price = new.product_price,
+            last_update_date = new.last_update_date,
+            image_url = COALESCE(new.image_url, products_v2.image_url)
+        """
+        data = [
+            (item['product_id'], item['product_link'], item['product_name'], item['product_price'], item['now'], item['now'],
+             item.get('image_url'))
+            for item in inserts if item.get('product_id')
+        ]
+        if data:
+            await cur.executemany(query, data)
+    if updates:
+        logger.debug("db_bulk_worker: Executing update for %d records.", len(updates))
+        query = """
+        UPDATE products_v2 SET product_price = %s, last_update_date = %s, image_url = COALESCE(%s, image_url)
+        WHERE product_id = %s
+        """
+        data = [
+            (item['product_price'], item['now'], item.get('image_url'), item['product_id'])
+            for item in updates if item.get('product_id')
+        ]
+        if data:
+            await cur.executemany(query, data)
+
+async def _drain(pool, db_update_queue, batch, batch_size, pending_seen):
+    """
+    Kapanışta elde kalan batch'i, kuyrukta bekleyen her şeyi,
+    henüz yazılmamış "seen" zamanlarını ve bildirim dedupe kayıtlarını yazar.
+    """
+    pending = list(batch)
+    while True:
+        try:
+            pending.append(db_update_queue.get_nowait())
+            db_update_queue.task_done()
+        except asyncio.QueueEmpty:
+            break
+    pending = _split_seen(pending, pending_seen)
+    if pending or pending_seen:
+        logger.info("db_bulk_worker: Kapanışta %d kayıt yazılıyor...", len(pending) + len(pending_seen))
+        flush_logs()
+        for i in range(0, len(pending), batch_size):
+            try:
+                await _write_batch(pool, pending[i:i + batch_size])
+            except Exception as e:
+                logger.error("db_bulk_worker: Kapanış yazımında hata: %s", e)
+        try:
+            await _flush_seen(pool, pending_seen)
+        except Exception as e:
+            logger.error("db_bulk_worker: Kapanış yazımında hata: %s", e)
+    # Normal batch yolundaki gibi son batch'in dedupe kayıtları da diske iner
+    await notified_prices.flush_async()
+    flush_logs()
+
+async def db_bulk_worker(pool, db_update_queue, flush_interval=1.0, batch_size=100,
+                         seen_flush_interval=SEEN_FLUSH_INTERVAL):
     logger.info("db_bulk_worker: Database bulk worker started.")
     flush_logs()
+    pending_seen = {}
+    last_seen_flush = time.monotonic()
     while True:
         batch = []
         try:
-            item = await db_update_queue.get()
-            batch.append(item)
-            start = time.time()
-            while len(batch) < batch_size and (time.time() - start) < flush_interval:
-                try:
-                    item = db_update_queue.get_nowait()
-                    batch.append(item)
-                except asyncio.QueueEmpty:
-                    await asyncio.sleep(0.01)
-            logger.info("db_bulk_worker: Batch size collected: %d", len(batch))
-            flush_logs()
-            inserts = [item for item in batch if not item.get('is_update', False)]
-            updates = [item for item in batch if item.get('is_update', False)]
-            async with pool.acquire() as conn:
-                async with conn.cursor() as cur:
-                    if inserts:
-                        logger.info("db_bulk_worker: Executing insert for %d records.", len(inserts))
-                        flush_logs()
-                        query = """
-                        INSERT INTO products (product_link, product_name, product_price, first_seen_date, last_update_date)
-                        VALUES (%s, %s, %s, %s, %s) AS new
-                        ON DUPLICATE KEY UPDATE 
-                            product_price = new.product_price,
-                            last_update_date = new.last_update_date
-                        """
-                        data = [
-                            (item['product_link'], item['product_name'], item['product_price'], item['now'], item['now'])
-                            for item in inserts
-                        ]
-                        await cur.executemany(query, data)
-                    if updates:
-                        logger.info("db_bulk_worker: Executing update for %d records.", len(updates))
-                        flush_logs()
-                        query = "UPDATE products SET product_price = %s, last_update_date = %s WHERE product_link = %s"
-                        data = [
-                            (item['product_price'], item['now'], item['product_link'])
-                            for item in updates
-                        ]
-                        await cur.executemany(query, data)
-                    await conn.commit()
-                    logger.info("db_bulk_worker: Batch operation completed.")
-                    flush_logs()
+            await _collect_batch(db_update_queue, batch, flush_interval, batch_size)
+            t0 = time.perf_counter()
+            await _write_batch(pool, _split_seen(batch, pending_seen))
+            if pending_seen and time.monotonic() - last_seen_flush >= seen_flush_interval:
+                await _flush_seen(pool, pending_seen)
+                last_seen_flush = time.monotonic()
+            # Bildirim dedupe kayıtları ürün yazımlarıyla aynı batch'te diske iner
+            await notified_prices.flush_async()
+            latency = time.perf_counter() - t0
+            db_worker_stats["batches"] += 1
+            db_worker_stats["items"] += len(batch)
+            db_worker_stats["last_batch_size"] = len(batch)
+            db_worker_stats["last_batch_latency"] = latency
+            db_worker_stats["queue_depth"] = db_update_queue.qsize()
+            logger.debug("db_bulk_worker: %d kayıt %.3f sn'de yazıldı, kuyruk: %d",
+                         len(batch), latency, db_update_queue.qsize())
+        except asyncio.CancelledError:
+            await _drain(pool, db_update_queue, batch, batch_size, pending_seen)
+            raise
         except Exception as e:
+            db_worker_stats["errors"] += 1
             logger.error("db_bulk_worker: Error occurred: %s", e)
-            flush_logs()
\ No newline at end of file
+            flush_logs()
+        finally:
+            for _ in batch:
+                db_update_queue.task_done()
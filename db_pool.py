@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# db_pool.py
+
+import time
+import asyncio
+from contextlib import asynccontextmanager
+import aiomysql
+
+from config import DATABASE_CONFIG
+from logconfig import logger, flush_logs
+
+DB_POOL_IDLE_TIMEOUT = 60.0
+
+
+class PoolManager:
+    """
+    Süreç genelinde paylaşılan aiomysql pool'u.
+    Küçük başlar, talep geldikçe maxsize'a kadar büyür (aiomysql davranışı),
+    idle_timeout boyunca acquire olmazsa boştaki bağlantıları kapatıp minsize'a döner.
+    acquire bekleme süresi ve kullanımdaki bağlantı sayısı stats() ile okunur.
+
+    aiomysql pool'unun acquire/close/wait_closed arayüzünü taklit ettiği için
+    mevcut `async with pool.acquire() as conn` kodu değişmeden çalışır.
+    """
+
+    def __init__(self, config: dict = None, idle_timeout: float = DB_POOL_IDLE_TIMEOUT, name: str = "medios"):
+        self.config = dict(config or DATABASE_CONFIG)
+        self.idle_timeout = idle_timeout
+        self.name = name
+        self._pool = None
+        self._lock = asyncio.Lock()
+        self._shrink_task = None
+        self._in_use = 0
+        self._waiting = 0
+        self._acquires = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._last_acquire = time.monotonic()
+
+    async def start(self):
+        if self._pool is not None:
+            return self
+        async with self._lock:
+            if self._pool is None:
+                logger.info("PoolManager(%s): Pool oluşturuluyor (min=%s, max=%s)...",
+                            self.name, self.config.get('minsize'), self.config.get('maxsize'))
+                flush_logs()
+                self._pool = await aiomysql.create_pool(**self.config)
+                self._shrink_task = asyncio.create_task(self._shrink_loop())
+        return self
+
+    @asynccontextmanager
+    async def acquire(self):
+        await self.start()
+        self._waiting += 1
+        t0 = time.perf_counter()
+        try:
+            conn = await self._pool.acquire()
+        finally:
+            self._waiting -= 1
+        wait = time.perf_counter() - t0
+        self._acquires += 1
+        self._wait_total += wait
+        self._wait_max = max(self._wait_max, wait)
+        self._last_acquire = time.monotonic()
+        self._in_use += 1
+        try:
+            yield conn
+        finally:
+            self._in_use -= 1
+            self._pool.release(conn)
+
+    async def _shrink_loop(self):
+        while True:
+            await asyncio.sleep(self.idle_timeout / 2)
+            pool = self._pool
+            if pool is None:
+                return
+            idle_for = time.monotonic() - self._last_acquire
+            if idle_for >= self.idle_timeout and pool.freesize > pool.minsize:
+                before = pool.size
+                try:
+                    # Boştaki bağlantıları kapatır; sonraki acquire minsize'a kadar yeniden doldurur
+                    await pool.clear()
+                    logger.debug("PoolManager(%s): Boşta küçültüldü: %d -> %d bağlantı.",
+                                 self.name, before, pool.size)
+                except Exception as e:
+                    logger.warning("PoolManager(%s): Küçültme hatası: %s", self.name, e)
+
+    def stats(self) -> dict:
+        pool = self._pool
+        return {
+            "size": pool.size if pool else 0,
+            "free": pool.freesize if pool else 0,
+            "in_use": self._in_use,
+            "waiting": self._waiting,
+            "maxsize": pool.maxsize if pool else self.config.get('maxsize'),
+            "acquires": self._acquires,
+            "acquire_wait_total": self._wait_total,
+            "acquire_wait_max": self._wait_max,
+            "acquire_wait_avg": self._wait_total / self._acquires if self._acquires else 0.0,
+        }
+
+    def close(self):
+        if self._shrink_task is not None:
+            self._shrink_task.cancel()
+            self._shrink_task = None
+        if self._pool is not None:
+            self._pool.close()
+
+    async def wait_closed(self):
+        if self._pool is not None:
+            await self._pool.wait_closed()
+            self._pool = None
+            logger.info("PoolManager(%s): Pool kapatıldı. İstatistik: %s", self.name, self.stats())
+            flush_logs()
+
+
+shared_pool = PoolManager()
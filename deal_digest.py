@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# deal_digest.py
+
+import os
+
+from utilities import format_price_to_user_friendly
+from telegram_notifier import TELEGRAM_MESSAGE_MAX, TELEGRAM_MEDIA_GROUP_MAX
+
+# off: her fırsat ayrı bildirim; media: döngünün fırsatları sendMediaGroup albümleri;
+# summary: döngünün fırsatları tek (gerekirse bölünmüş) özet mesajı
+DIGEST_MODE = os.getenv("DIGEST_MODE", "off").strip().lower()
+DIGEST_MODES = ("off", "media", "summary")
+if DIGEST_MODE not in DIGEST_MODES:
+    DIGEST_MODE = "off"
+
+
+def digest_enabled() -> bool:
+    return DIGEST_MODE != "off"
+
+
+def rank_deals(deals: list[dict]) -> list[dict]:
+    """
+    Fırsatları Akakçe'ye göre indirim tutarına göre büyükten küçüğe sıralar.
+    """
+    return sorted(deals, key=lambda deal: deal["saving"], reverse=True)
+
+
+def deal_text(deal: dict) -> str:
+    """
+    Tek fırsatın Telegram metni (tekil bildirim ve albüm açıklaması).
+    """
+    return (
+        f"{deal['product_name']}\n{deal['product_link']}\n"
+        f"Fiyat: {format_price_to_user_friendly(deal['price'])}\n"
+        f"Akakçeden: {format_price_to_user_friendly(deal['saving'])} daha ucuz!"
+    )
+
+
+def summary_text(deals: list[dict]) -> str:
+    """
+    Sıralı fırsat listesinin tamamı (ZMQ yükü için; bölünmez).
+    """
+    return "\n\n".join(_summary_blocks(deals))
+
+
+def _summary_blocks(deals: list[dict]) -> list[str]:
+    blocks = [f"{len(deals)} fırsat (en büyük indirim önce):"]
+    for i, deal in enumerate(deals, 1):
+        blocks.append(
+            f"{i}. {deal['product_name']}\n"
+            f"Fiyat: {format_price_to_user_friendly(deal['price'])} "
+            f"(Akakçeden {format_price_to_user_friendly(deal['saving'])} ucuz)\n"
+            f"{deal['product_link']}"
+        )
+    return blocks
+
+
+def summary_messages(deals: list[dict], limit: int = TELEGRAM_MESSAGE_MAX) -> list[str]:
+    """
+    Özet metnini Telegram mesaj sınırını aşmayacak şekilde fırsat sınırlarından böler.
+    """
+    messages = []
+    current = ""
+    for block in _summary_blocks(deals):
+        block = block[:limit]
+        candidate = f"{current}\n\n{block}" if current else block
+        if len(candidate) > limit:
+            messages.append(current)
+            current = block
+        else:
+            current = candidate
+    if current:
+        messages.append(current)
+    return messages
+
+
+def media_groups(deals: list[dict], size: int = TELEGRAM_MEDIA_GROUP_MAX) -> list[list[dict]]:
+    """
+    Fırsatları en fazla size elemanlı albümlere böler. Albüm en az 2 görsel
+    istediğinden tek kalan son eleman önceki albümden bir eleman alır.
+    """
+    groups = [deals[i:i + size] for i in range(0, len(deals), size)]
+    if len(groups) > 1 and len(groups[-1]) == 1:
+        groups[-1].insert(0, groups[-2].pop())
+    return groups
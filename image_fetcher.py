@@ -0,0 +1,309 @@
+#!/usr/bin/env python
+# image_fetcher.py
+
+import os
+import re
+import time
+import html
+import asyncio
+import itertools
+import urllib.parse
+from io import BytesIO
+import httpx
+from bs4 import BeautifulSoup
+from PIL import Image
+
+from logconfig import logger, flush_logs
+from medios_image_utils import get_cache_filename
+from thumbnail_cache import thumbnail_cache
+from basket_http import HTTP_HEADERS
+from browser_manager import browser_manager
+from metrics import metrics
+
+IMAGE_FETCH_CONCURRENCY = int(os.getenv("IMAGE_FETCH_CONCURRENCY", "8"))
+# Host başına saniyedeki en fazla istek; 0 = sınırsız
+IMAGE_HOST_RATE = float(os.getenv("IMAGE_HOST_RATE", "5"))
+IMAGE_FETCH_TIMEOUT = float(os.getenv("IMAGE_FETCH_TIMEOUT", "10"))
+# og:image aranırken ürün sayfasından okunacak en fazla bayt
+IMAGE_PAGE_MAX_BYTES = 512 * 1024
+IMAGE_MAX_BYTES = 10 * 1024 * 1024
+# Görseli indirilemeyen link en fazla bu kadar ön yükleme geçişinde tekrar denenir
+IMAGE_PRELOAD_MAX_ATTEMPTS = int(os.getenv("IMAGE_PRELOAD_MAX_ATTEMPTS", "3"))
+# Bildirim, görseli cache'te olmayan ürün için en fazla bu kadar saniye görseli bekler
+NOTIFY_IMAGE_WAIT = float(os.getenv("NOTIFY_IMAGE_WAIT", "15"))
+
+# Küçük değer önce indirilir: bildirimi gönderilecek ürünler ön yüklemenin önüne geçer
+PRIORITY_NOTIFY = 0
+PRIORITY_PRELOAD = 1
+
+OG_IMAGE_PATTERN = re.compile(
+    r'<meta\b(?=[^>]*\bproperty\s*=\s*["\']og:image["\'])[^>]*>', re.IGNORECASE
+)
+META_CONTENT_PATTERN = re.compile(r'\bcontent\s*=\s*["\']([^"\']+)["\']', re.IGNORECASE)
+
+
+def find_og_image(text: str) -> str | None:
+    """
+    HTML parçasındaki og:image meta etiketinin content değerini döner.
+    """
+    m = OG_IMAGE_PATTERN.search(text)
+    if not m:
+        return None
+    content = META_CONTENT_PATTERN.search(m.group(0))
+    return html.unescape(content.group(1)) if content else None
+
+
+def find_fallback_image(text: str) -> str | None:
+    """
+    og:image yoksa ürün galerisindeki ilk görseli döner.
+    """
+    soup = BeautifulSoup(text, "html.parser")
+    pic = soup.find("picture", {"data-test": "product-image"})
+    if pic and pic.img and pic.img.get("src"):
+        return pic.img["src"]
+    return None
+
+
+def save_image(data: bytes, cache_file: str, link: str = None, source: str = None) -> str:
+    """
+    Görseli çözüp küçük önizleme olarak cache'e yazar (thread'de çalıştırılır).
+    """
+    return thumbnail_cache.write(Image.open(BytesIO(data)), cache_file, link, source)
+
+
+class HostRateLimiter:
+    """
+    Host başına istekleri en az 1/rate saniye aralıkla başlatır.
+    Her çağrı bir sonraki boş zaman dilimini rezerve eder; event loop tek thread olduğundan kilit gerekmez.
+    """
+
+    def __init__(self, rate: float = IMAGE_HOST_RATE):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = {}
+
+    async def wait(self, host: str):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        slot = max(now, self._next.get(host, now))
+        self._next[host] = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+class ImageFetcher:
+    """
+    Ürün önizleme görsellerini tek, paylaşılan HTTP/2 istemcisiyle indirir.
+    İstekler öncelik kuyruğuna girer ve `concurrency` adet worker tarafından işlenir;
+    host başına hız HostRateLimiter ile sınırlanır.
+    Sepette yakalanan görsel URL'si verilmişse doğrudan o indirilir; yoksa (veya inmezse)
+    og:image sayfa stream edilerek bulunur ve bulunduğu anda bağlantı bırakılır.
+    Görselin çözülüp diske yazılması event loop dışında yapılır.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = IMAGE_FETCH_CONCURRENCY,
+        host_rate: float = IMAGE_HOST_RATE,
+        timeout: float = IMAGE_FETCH_TIMEOUT
+    ):
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self._rate_limiter = HostRateLimiter(host_rate)
+        self._client = None
+        self._queue = asyncio.PriorityQueue()
+        self._seq = itertools.count()
+        self._workers = []
+        # Aynı link için eşzamanlı indirmeleri birleştirir: link -> (future, öncelik)
+        self._inflight = {}
+        self._running = set()
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                http2=True,
+                headers=HTTP_HEADERS,
+                follow_redirects=True,
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.concurrency,
+                    max_keepalive_connections=self.concurrency
+                )
+            )
+        return self._client
+
+    async def _find_image_url(self, url: str) -> str | None:
+        """
+        Ürün sayfasını parça parça okur; og:image bulunursa okumayı keser.
+        """
+        await self._rate_limiter.wait(urllib.parse.urlsplit(url).hostname or "")
+        buf = ""
+        async with self._get_client().stream("GET", url) as resp:
+            if resp.status_code != 200:
+                logger.warning("ImageFetcher: Sayfa HTTP %s: %s", resp.status_code, url)
+                return None
+            async for chunk in resp.aiter_text():
+                # Parça sınırına denk gelen etiketi kaçırmamak için son kısmı da tara
+                scan_from = max(0, len(buf) - 1024)
+                buf += chunk
+                img_url = find_og_image(buf[scan_from:])
+                if img_url:
+                    return img_url
+                if len(buf) >= IMAGE_PAGE_MAX_BYTES:
+                    break
+        return find_fallback_image(buf)
+
+    async def _find_image_url_browser(self, url: str) -> str | None:
+        """
+        HTTP ile sayfa alınamazsa (challenge vb.) paylaşılan tarayıcıdan HTML alır.
+        """
+        async with browser_manager.context() as context:
+            page = await context.new_page()
+            try:
+                await page.goto(url, wait_until="domcontentloaded", timeout=10000)
+                text = await page.content()
+            finally:
+                await page.close()
+        return find_og_image(text) or find_fallback_image(text)
+
+    async def _download(self, img_url: str) -> bytes | None:
+        await self._rate_limiter.wait(urllib.parse.urlsplit(img_url).hostname or "")
+        async with self._get_client().stream("GET", img_url, headers={"Accept": "image/*"}) as resp:
+            if resp.status_code != 200:
+                logger.warning("ImageFetcher: Görsel HTTP %s: %s", resp.status_code, img_url)
+                return None
+            data = bytearray()
+            async for chunk in resp.aiter_bytes():
+                data += chunk
+                if len(data) > IMAGE_MAX_BYTES:
+                    logger.warning("ImageFetcher: Görsel çok büyük, atlandı: %s", img_url)
+                    return None
+        return bytes(data)
+
+    async def _try_download(self, img_url: str) -> bytes | None:
+        try:
+            return await self._download(img_url)
+        except httpx.HTTPError as e:
+            logger.warning("ImageFetcher: Görsel indirilemedi: %s (%s)", img_url, e)
+            return None
+
+    async def _lookup_image_url(self, url: str) -> str | None:
+        metrics.inc("image_page_lookups")
+        try:
+            img_url = await self._find_image_url(url)
+        except httpx.HTTPError as e:
+            logger.warning("ImageFetcher: Sayfa alınamadı (%s), tarayıcı deneniyor: %s", e, url)
+            img_url = None
+        if not img_url:
+            try:
+                img_url = await self._find_image_url_browser(url)
+            except Exception as e:
+                logger.error("ImageFetcher: Tarayıcı ile sayfa alınamadı: %s", e)
+        if not img_url:
+            logger.warning("ImageFetcher: Görsel URL'si bulunamadı: %s", url)
+            flush_logs()
+            return None
+        return urllib.parse.urljoin(url, img_url)
+
+    async def _fetch(self, url: str, cache_file: str, image_url: str = None) -> str | None:
+        data = None
+        source = image_url
+        if image_url:
+            metrics.inc("image_direct_downloads")
+            data = await self._try_download(image_url)
+        if not data:
+            source = await self._lookup_image_url(url)
+            if not source:
+                return None
+            data = await self._try_download(source)
+        if not data:
+            return None
+        try:
+            return await asyncio.to_thread(save_image, data, cache_file, url, source)
+        except Exception as e:
+            logger.warning("ImageFetcher: Görsel kaydedilemedi: %s (%s)", url, e)
+            flush_logs()
+            return None
+
+    async def _worker(self):
+        while True:
+            _, _, url, cache_file, image_url = await self._queue.get()
+            entry = self._inflight.get(url)
+            # Önceliği yükseltilen link kuyrukta iki kez bulunur; ikinci kayıt atlanır
+            if entry is None or entry[0].done() or url in self._running:
+                continue
+            future = entry[0]
+            self._running.add(url)
+            try:
+                result = await self._fetch(url, cache_file, image_url)
+            except Exception as e:
+                logger.error("ImageFetcher: Beklenmeyen hata (%s): %s", url, e)
+                flush_logs()
+                result = None
+            finally:
+                self._running.discard(url)
+            if not future.done():
+                future.set_result(result)
+
+    def _ensure_workers(self):
+        if not self._workers:
+            self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def get_cached_preview_image(
+        self,
+        url: str,
+        priority: int = PRIORITY_PRELOAD,
+        image_url: str = None
+    ) -> str | None:
+        """
+        Ürün linkinin önizleme görselini cache'e indirir ve dosya yolunu döner;
+        zaten cache'teyse (image_url verilmişse aynı görselden) indirmeden döner.
+        Kuyrukta bekleyen bir link daha yüksek öncelikle istenirse sırası öne alınır.
+        """
+        cache_file = get_cache_filename(url)
+        if thumbnail_cache.has(url, image_url) and os.path.exists(cache_file):
+            return cache_file
+        self._ensure_workers()
+        entry = self._inflight.get(url)
+        if entry is None:
+            future = asyncio.get_running_loop().create_future()
+            future.add_done_callback(lambda _: self._inflight.pop(url, None))
+            self._inflight[url] = (future, priority)
+            self._queue.put_nowait((priority, next(self._seq), url, cache_file, image_url))
+        else:
+            future, queued = entry
+            if priority < queued:
+                self._inflight[url] = (future, priority)
+                self._queue.put_nowait((priority, next(self._seq), url, cache_file, image_url))
+        return await asyncio.shield(future)
+
+    async def fetch_many(self, urls, image_urls: dict = None) -> int:
+        """
+        Linklerin görsellerini eşzamanlılık sınırı içinde indirir; başarılı sayısını döner.
+        image_urls: bilinen link -> görsel URL'si eşlemesi.
+        """
+        image_urls = image_urls or {}
+        results = await asyncio.gather(
+            *(self.get_cached_preview_image(url, image_url=image_urls.get(url)) for url in urls),
+            return_exceptions=True
+        )
+        for r in results:
+            if isinstance(r, Exception):
+                logger.error("ImageFetcher: Beklenmeyen hata: %s", r)
+        flush_logs()
+        return sum(1 for r in results if isinstance(r, str))
+
+    async def close(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        for future, _ in list(self._inflight.values()):
+            if not future.done():
+                future.set_result(None)
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+image_fetcher = ImageFetcher()
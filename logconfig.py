@@ -1,19 +1,146 @@
 # logconfig.py
-import logging
+#
+# Log kayıtları çağıran thread'de biçimlendirilmez; QueueHandler ile kuyruğa
+# atılır ve arka plandaki QueueListener thread'i biçimlendirip dosyaya/konsola
+# yazar. Dosya boyuta göre döndürülür ve her kayıtta değil periyodik olarak flush edilir.
 import os
+import time
+import queue
+import atexit
+import logging
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+LOG_FILE = os.getenv("LOG_FILE", "media_log.txt")
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+LOG_FLUSH_INTERVAL = float(os.getenv("LOG_FLUSH_INTERVAL", "1.0"))
+
+
+class BufferedRotatingFileHandler(RotatingFileHandler):
+    """
+    Her kayıttan sonra değil en fazla flush_interval saniyede bir diske flush eder.
+    Dosya boyutu her kayıtta seek/stat yapmak yerine yazılan baytlardan takip edilir;
+    her kayıt bir kez biçimlendirilir.
+    """
+
+    # Metin modunda "\n" diskte os.linesep olarak yazılır (Windows'ta 2 bayt)
+    _LINESEP_EXTRA = len(os.linesep) - 1
+
+    def __init__(self, *args, flush_interval: float = LOG_FLUSH_INTERVAL, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.flush_interval = flush_interval
+        self._last_flush = time.monotonic()
+        try:
+            self._size = os.path.getsize(self.baseFilename)
+        except OSError:
+            self._size = 0
+
+    def emit(self, record):
+        try:
+            msg = self.format(record) + self.terminator
+            size = len(msg.encode(self.encoding or "utf-8", self.errors or "strict"))
+            size += msg.count("\n") * self._LINESEP_EXTRA
+            if self.maxBytes > 0 and self._size > 0 and self._size + size >= self.maxBytes:
+                self.doRollover()
+                self._size = 0
+            if self.stream is None:
+                self.stream = self._open()
+            self.stream.write(msg)
+            self._size += size
+            self.flush()
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush_now()
+
+    def flush_now(self):
+        self._last_flush = time.monotonic()
+        super().flush()
+
+    def close(self):
+        self.flush_now()
+        super().close()
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    Kaydı biçimlendirmeden kuyruğa koyar; mesaj birleştirme ve biçimlendirme
+    listener thread'inde yapılır. Kuyruk süreç içi olduğundan kaydın kopyalanmasına gerek yoktur.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+class FlushingQueueListener(QueueListener):
+    """
+    Kuyruk flush_interval boyunca boş kalırsa handler'ları flush eder,
+    böylece yoğunluk bittiğinde son kayıtlar da diske iner.
+    """
+
+    def __init__(self, q, *handlers, flush_interval: float = LOG_FLUSH_INTERVAL, **kwargs):
+        super().__init__(q, *handlers, **kwargs)
+        self.flush_interval = flush_interval
+
+    def dequeue(self, block):
+        while True:
+            try:
+                return self.queue.get(block, self.flush_interval)
+            except queue.Empty:
+                for handler in self.handlers:
+                    if isinstance(handler, BufferedRotatingFileHandler):
+                        handler.flush_now()
+                    else:
+                        handler.flush()
+
+
 logger = logging.getLogger("central_services")
 log_level = os.getenv("LOG_LEVEL", "INFO").upper()
 numeric_level = getattr(logging, log_level, logging.INFO)
+# Logger seviyesi altındaki çağrılar (ör. debug) kuyruğa bile girmez
 logger.setLevel(numeric_level)
-fh = logging.FileHandler("media_log.txt", encoding="utf-8")
-fh.setLevel(numeric_level)
 formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+fh = BufferedRotatingFileHandler(
+    LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8"
+)
+fh.setLevel(numeric_level)
 fh.setFormatter(formatter)
-logger.addHandler(fh)
 ch = logging.StreamHandler()
 ch.setLevel(numeric_level)
 ch.setFormatter(formatter)
-logger.addHandler(ch)
+
+log_queue = queue.SimpleQueue()
+listener = FlushingQueueListener(log_queue, fh, ch, respect_handler_level=True)
+logger.addHandler(DeferredQueueHandler(log_queue))
+listener.start()
+
+
+_log_shutdown = False
+
+
+def shutdown_logging():
+    """
+    Kuyruktaki kayıtları yazdırıp listener'ı durdurur ve dosyayı kapatır.
+    """
+    global _log_shutdown
+    if _log_shutdown:
+        return
+    _log_shutdown = True
+    listener.stop()
+    fh.close()
+    ch.flush()
+
+
+atexit.register(shutdown_logging)
+
+
 def flush_logs():
-    for handler in logger.handlers:
-        handler.flush()
+    """
+    Geriye dönük uyumluluk için korunur; yazma ve flush arka plan thread'inde
+    periyodik yapıldığından çağıranı bekletmez.
+    """
+    return None
@@ -11,38 +11,45 @@ if os.name == "nt":
 # ---------------------------------------------------------------
 
 import sys
-import json
 import time
 
-from database import create_pool, create_database, create_table, db_bulk_worker
+from config import PRODUCTS_TABLE
+from database import create_pool, create_database, create_table, db_bulk_worker, db_worker_stats, DB_QUEUE_MAXSIZE
+from db_pool import shared_pool
 from proxy_manager import initialize_proxy_manager, get_next_proxy
-from telegram_notifier import send_telegram_notification
+from telegram_notifier import send_telegram_notification, telegram_service
 from logconfig import flush_logs, logger
-from dependencies import zmq_publish_message
-from medios_image_utils import get_cached_preview_image, get_cache_filename
+from image_fetcher import image_fetcher, IMAGE_PRELOAD_MAX_ATTEMPTS
+from thumbnail_cache import thumbnail_cache
 
 from LoginCookieModule import login_and_save_cookies
-from medios_iki import scrape_page_with_context
+from medios_iki import scrape_page_with_context, scrape_basket_http
+from basket_http import BASKET_FETCH_MODE, HTTP_HEADERS, load_cookie_jar
+from akakce_resolver import akakce_resolver
+from product_snapshot import product_snapshot
+from browser_manager import browser_manager, COOKIES_FILE
 from medios_uc import wait_for_products, notification_worker
+from metrics import metrics
+from zmq_publisher import zmq_publisher
+from notify_dedupe import notified_prices
 
 BASE_URL = "https://www.mediamarkt.com.tr"
-DATABASE_CONFIG = {
-    'user': os.getenv("DB_USER", "root"),
-    'password': os.getenv("DB_PASSWORD"),
-    'db': os.getenv("DB_NAME"),
-    'host': os.getenv("DB_HOST"),
-    'port': int(os.getenv("DB_PORT", "3306")),
-    'minsize': 80,
-    'maxsize': 150
-}
 
-db_update_queue    = asyncio.Queue()
+db_update_queue    = asyncio.Queue(maxsize=DB_QUEUE_MAXSIZE)
 notification_queue = asyncio.Queue()
 state = {
     "count": 0,
-    "notified_prices": {}
+    # Kalıcı (SQLite) son bildirilen fiyatlar; dict gibi kullanılır
+    "notified_prices": notified_prices,
+    # İlk ön yükleme geçişi tüm snapshot'ı manifest ile karşılaştırır, sonrakiler yalnızca değişenleri
+    "images_synced": False,
+    # Görseli indirilemeyen link -> deneme sayısı
+    "image_retries": {}
 }
 
+# Cache'ten silinen/üzerine yazılan görsellerin Telegram file_id kayıtları da atılır
+thumbnail_cache.add_remove_listener(telegram_service.file_ids.forget)
+
 def log_info(msg: str):
     logger.info(msg)
     flush_logs()
@@ -50,14 +57,13 @@ def log_info(msg: str):
 async def is_products_table_filled(pool):
     async with pool.acquire() as conn:
         async with conn.cursor() as cur:
-            await cur.execute("SELECT COUNT(*) FROM products")
+            await cur.execute(f"SELECT COUNT(*) FROM {PRODUCTS_TABLE}")
             return (await cur.fetchone())[0] > 0
 
 async def scrape_med():
     log_info("scrape_med: Başlatılıyor.")
     state["count"] = 0
     start = time.time()
-    pool = None
 
     # --- Proxy ve çerez ortamını temizle ---
     os.environ.pop("HTTP_PROXY", None)
@@ -79,110 +85,149 @@ async def scrape_med():
         proxy_cfg = None
 
     try:
-        from playwright.async_api import async_playwright
-        log_info("scrape_med: Playwright başlatılıyor.")
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=True)
-            if proxy_cfg:
-                context = await browser.new_context(proxy=proxy_cfg)
+        # Veritabanı hazırlığı (paylaşılan pool; döngü sonunda kapatılmaz)
+        await create_database()
+        pool = await create_pool()
+        await create_table(pool)
+        await product_snapshot.ensure_loaded(pool)
+        log_info("scrape_med: Veritabanı hazır.")
+
+        import httpx
+        url = BASE_URL + "/tr/checkout"
+
+        if proxy_str:
+            os.environ["HTTP_PROXY"] = proxy_str
+            os.environ["HTTPS_PROXY"] = proxy_str
+
+        async with httpx.AsyncClient(
+            http2=True,
+            timeout=httpx.Timeout(10.0, connect=5.0),
+            headers=HTTP_HEADERS,
+            cookies=load_cookie_jar(COOKIES_FILE),
+            follow_redirects=True
+        ) as client:
+            # Önce tarayıcısız HTTP yolu; challenge/parse hatasında Playwright'a düş
+            if BASKET_FETCH_MODE == "http" and await scrape_basket_http(
+                client, url, pool,
+                db_update_queue, notification_queue, state
+            ):
+                log_info("scrape_med: Sepet HTTP ile işlendi.")
             else:
-                context = await browser.new_context()
-
-            log_info("scrape_med: Browser context hazır.")
-
-            # Eğer daha önce kaydedilmiş cerez varsa ekleyelim
-            if os.path.exists("cookies.json"):
-                with open("cookies.json", "r", encoding="utf-8") as f:
-                    saved_cookies = json.load(f)
-                await context.add_cookies(saved_cookies)
-                log_info("scrape_med: Kayıtlı cerezler context'e eklendi.")
-
-            # Gereksiz kaynakları abort et
-            await context.route(
-                "**/*",
-                lambda r, req: r.abort() if req.resource_type in {
-                    "image","media","font","iframe","track","analytics","pixel","tag","facebook","doubleclick"
-                } else r.continue_()
-            )
-            log_info("scrape_med: Routing ayarlandı.")
-
-            # Veritabanı hazırlığı
-            await create_database()
-            pool = await create_pool()
-            await create_table(pool)
-            log_info("scrape_med: Veritabanı hazır.")
-
-            import httpx
-            url = BASE_URL + "/tr/checkout"
-
-            if proxy_str:
-                os.environ["HTTP_PROXY"] = proxy_str
-                os.environ["HTTPS_PROXY"] = proxy_str
-
-            async with httpx.AsyncClient(
-                http2=True,
-                timeout=httpx.Timeout(10.0, connect=5.0)
-            ) as client:
-                await scrape_page_with_context(
-                    context, client, url, pool,
-                    db_update_queue, notification_queue, state
-                )
-
-            await browser.close()
+                # Tarayıcı ve context döngüler arasında açık kalır
+                async with browser_manager.context(proxy_cfg) as context:
+                    log_info("scrape_med: Browser context hazır.")
+                    await scrape_page_with_context(
+                        context, client, url, pool,
+                        db_update_queue, notification_queue, state
+                    )
 
     except Exception as e:
         logger.error(f"scrape_med: Hata: {e}")
         flush_logs()
-    finally:
-        if pool:
-            pool.close()
-            await pool.wait_closed()
-            log_info("scrape_med: DB pool kapatıldı.")
 
     elapsed = time.time() - start
     log_info(f"scrape_med: Tamamlandı: {elapsed:.2f} sn, ürün sayısı: {state['count']}")
 
-async def preload_images(pool):
-    log_info("preload_images: Linkler alınıyor...")
-    async with pool.acquire() as conn:
-        async with conn.cursor() as cur:
-            await cur.execute("SELECT product_link FROM products")
-            rows = await cur.fetchall()
-    links = [r[0] for r in rows if r[0]]
-    log_info(f"preload_images: {len(links)} link bulundu.")
-    tasks = []
-    for link in links:
-        cache_file = get_cache_filename(link)
-        if not os.path.exists(cache_file):
-            tasks.append(asyncio.to_thread(get_cached_preview_image, link))
-    if tasks:
-        await asyncio.gather(*tasks)
-    log_info("preload_images: Tamamlandı.")
+async def preload_images():
+    """
+    Son geçişten beri eklenen/adı veya görseli değişen ürünlerin ve önceki geçişte
+    indirilemeyenlerin görsellerini indirir. Cache'te olup olmadığı ve aynı görsel URL'sinden
+    indirilip indirilmediği thumbnail manifest'inden okunur.
+    """
+    changed = product_snapshot.drain_changed()
+    # Görsel URL'si bilinmeyen ürünün adı değiştiyse görseli de değişmiş olabilir
+    for link in product_snapshot.drain_renamed():
+        if not product_snapshot.image_url(link):
+            thumbnail_cache.invalidate(link)
+    if not state["images_synced"]:
+        changed.update(product_snapshot.links())
+        state["images_synced"] = True
+    retries = state["image_retries"]
+    changed.update(retries)
+    image_urls = {link: product_snapshot.image_url(link) for link in changed}
+    missing = [link for link in changed if not thumbnail_cache.has(link, image_urls[link])]
+    if not missing:
+        return
+    downloaded = await image_fetcher.fetch_many(missing, image_urls)
+    for link in missing:
+        if thumbnail_cache.has(link, image_urls[link]):
+            retries.pop(link, None)
+        elif retries.get(link, 0) + 1 >= IMAGE_PRELOAD_MAX_ATTEMPTS:
+            retries.pop(link, None)
+        else:
+            retries[link] = retries.get(link, 0) + 1
+    await asyncio.to_thread(thumbnail_cache.save_manifest)
+    log_info(f"preload_images: {downloaded}/{len(missing)} yeni görsel indirildi ({len(changed)} değişen ürün).")
+
+def register_metrics_gauges():
+    """
+    Kuyruk derinliklerini, DB worker, pool ve thumbnail cache istatistiklerini metrics gauge'ı olarak kaydeder.
+    """
+    metrics.register_gauge("db_update_queue_depth", db_update_queue.qsize)
+    metrics.register_gauge("notification_queue_depth", notification_queue.qsize)
+    metrics.register_gauge("product_snapshot_size", lambda: len(product_snapshot))
+    for key in ("batches", "items", "errors", "seen_flushed"):
+        metrics.register_gauge(f"db_worker_{key}", lambda k=key: db_worker_stats[k], kind="counter")
+    metrics.register_gauge("db_worker_last_batch_size", lambda: db_worker_stats["last_batch_size"])
+    metrics.register_gauge("db_worker_last_batch_latency_seconds", lambda: db_worker_stats["last_batch_latency"])
+    for key in ("size", "free", "in_use", "waiting"):
+        metrics.register_gauge(f"db_pool_{key}", lambda k=key: shared_pool.stats()[k])
+    metrics.register_gauge("db_pool_acquires", lambda: shared_pool.stats()["acquires"], kind="counter")
+    metrics.register_gauge("db_pool_acquire_wait_max_seconds", lambda: shared_pool.stats()["acquire_wait_max"])
+    metrics.register_gauge("telegram_pending", lambda: telegram_service.pending)
+    metrics.register_gauge("thumbnail_cache_files", lambda: thumbnail_cache.stats()["files"])
+    metrics.register_gauge("thumbnail_cache_bytes", lambda: thumbnail_cache.stats()["bytes"])
+    metrics.register_gauge("notified_prices_size", lambda: len(notified_prices))
 
 async def repeated_scrape():
     log_info("repeated_scrape: Başlatılıyor.")
     pool = await create_pool()
     await create_table(pool)
+    await product_snapshot.ensure_loaded(pool)
+    await asyncio.to_thread(thumbnail_cache.load)
+    await asyncio.to_thread(notified_prices.load)
+    register_metrics_gauges()
+    await metrics.start_server()
 
     dbw  = asyncio.create_task(db_bulk_worker(pool, db_update_queue))
     notw = asyncio.create_task(notification_worker(notification_queue))
+    akakce_resolver.start_refresh()
 
     try:
+        cycle = 0
         while True:
+            cycle += 1
             log_info("repeated_scrape: Yeni döngü.")
             t0 = time.time()
-            await scrape_med()
+            with metrics.timer("scrape_cycle"):
+                await scrape_med()
             dt = time.time() - t0
             cnt = state["count"]
             log_info(f"repeated_scrape: Döngü süresi {dt:.2f} sn, {cnt} ürün.")
             await wait_for_products(pool, expected_minimum=1, timeout=2)
-            await preload_images(pool)
+            with metrics.timer("image_preload"):
+                await preload_images()
+            # Döngüde biriken file_id'ler manifest gibi toplu yazılır
+            await asyncio.to_thread(telegram_service.file_ids.save)
+            await metrics.write_snapshot(cycle=cycle, cycle_seconds=round(dt, 3), products=cnt)
             await asyncio.sleep(5)
     except asyncio.CancelledError:
         log_info("repeated_scrape: İptal edildi.")
     finally:
         dbw.cancel()
         notw.cancel()
+        # db_bulk_worker iptalde kuyrukta kalanları yazar; pool kapanmadan bitmesini bekle
+        await asyncio.gather(dbw, notw, return_exceptions=True)
+        await akakce_resolver.close()
+        # Bekleyen bildirimler görsel indirmesini bekleyebilir; image_fetcher'dan önce kapatılır
+        await telegram_service.close()
+        # Son bildirimlerin dedupe kayıtları db_bulk_worker bittikten sonra gelmiş olabilir
+        await asyncio.to_thread(notified_prices.close)
+        await zmq_publisher.close()
+        await image_fetcher.close()
+        await asyncio.to_thread(thumbnail_cache.save_manifest)
+        await browser_manager.close()
+        await metrics.close()
         pool.close()
         await pool.wait_closed()
         log_info("repeated_scrape: Worker’lar durduruldu, pool kapandı.")
@@ -207,24 +252,30 @@ async def main():
 
     await create_database()
     pool = await create_pool()
+    # İlk scrape'in evaluate_deal'ı dedupe deposunu event loop'ta yüklemesin
+    await asyncio.to_thread(notified_prices.load)
     await create_table(pool)
     if not await is_products_table_filled(pool):
         log_info("main: İlk scrape yapılıyor...")
-        await scrape_med()
+        # db_update_queue sınırlı; sepet DB_QUEUE_MAXSIZE'dan büyükse put() ancak
+        # kuyruğu boşaltan bir worker varken ilerler
+        dbw = asyncio.create_task(db_bulk_worker(pool, db_update_queue))
+        try:
+            await scrape_med()
+            await db_update_queue.join()
+        finally:
+            dbw.cancel()
+            await asyncio.gather(dbw, return_exceptions=True)
         cnt = await wait_for_products(pool, expected_minimum=1, timeout=2)
         log_info(f"main: {cnt} kayıt eklendi.")
     else:
         log_info("main: Veritabanı zaten dolu, başlatılıyor...")
 
-    pool.close()
-    await pool.wait_closed()
-
-    pool2 = await create_pool()
-    await wait_for_products(pool2, expected_minimum=1, timeout=2)
-    await preload_images(pool2)
-    pool2.close()
-    await pool2.wait_closed()
+    await wait_for_products(pool, expected_minimum=1, timeout=2)
+    # Görsel ön yüklemesi snapshot ve thumbnail indeksi yüklendikten sonra
+    # repeated_scrape'in ilk döngüsünde yapılır
 
+    # Aynı paylaşılan pool repeated_scrape'te de kullanılır ve orada kapatılır
     await repeated_scrape()
 
 if __name__ == "__main__":
@@ -3,146 +3,342 @@
 
 import os
 import json
-import re
 import asyncio
+import urllib.parse
 from datetime import datetime
-import aiomysql
 
-from config import BASE_URL, DATABASE_CONFIG, logger
-from utilities import extract_product_name_from_url, clean_price, format_price_to_user_friendly
-from telegram_notifier import send_telegram_notification
+from config import BASE_URL, logger
+from utilities import extract_product_name_from_url, extract_product_id, clean_price
+from telegram_notifier import send_telegram_notification, telegram_service
 from logconfig import flush_logs
 from medios_image_utils import get_cache_filename
-from dependencies import zmq_publish_message
-async def process_product(
+from thumbnail_cache import thumbnail_cache
+from image_fetcher import image_fetcher, PRIORITY_NOTIFY, NOTIFY_IMAGE_WAIT
+from akakce_resolver import akakce_resolver
+from product_snapshot import product_snapshot
+from basket_http import BASKET_SELECTOR, BasketFetchError, fetch_basket_items
+from metrics import metrics
+from deal_digest import digest_enabled, DIGEST_MODE, rank_deals, deal_text, summary_text, summary_messages, media_groups
+def price_changed(old_price, new_price) -> bool:
+    """
+    Kuruş hassasiyetinde fiyat değişti mi?
+    """
+    if old_price is None:
+        return True
+    return abs(float(old_price) - new_price) >= 0.005
+
+async def prepare_product(
     product_link: str,
     product_price_str: str,
     pool,
     db_update_queue: asyncio.Queue,
-    notification_queue: asyncio.Queue,
-    state: dict
-):
+    state: dict,
+    image_url: str = None
+) -> dict:
+    """
+    Fiyatı ayrıştırır, DB kuyruğuna ekleme/güncelleme kaydını koyar ve
+    Akakçe karşılaştırması için gereken ürün bilgisini döner.
+    image_url sepette yakalanan ürün görselidir; ürünle birlikte saklanır.
+    """
     # sayaçı artır
     state["count"] += 1
+    metrics.inc("products_processed")
 
     # fiyatı ayrıştır ve formatla
     price, _ = clean_price(product_price_str)
-    formatted = format_price_to_user_friendly(price)
     now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
     # tam link
     if not product_link.startswith("http"):
         product_link = BASE_URL + product_link
+    if image_url:
+        image_url = urllib.parse.urljoin(BASE_URL, image_url)
 
-    # mevcut kayıt
-    async with pool.acquire() as conn:
-        async with conn.cursor() as cur:
-            await cur.execute(
-                "SELECT product_price, product_name FROM products WHERE product_link=%s",
-                (product_link,)
-            )
-            existing = await cur.fetchone()
+    # mevcut kayıt (bellekteki products snapshot'ından)
+    with metrics.timer("product_lookup"):
+        existing = product_snapshot.get(product_link)
 
-    # db güncelle/ekle
-    if existing:
+    product_id = extract_product_id(product_link)
+
+    # db güncelle/ekle; fiyatı değişmeyen ürün için yalnızca "görüldü" kaydı
+    if existing and not price_changed(existing[0], price) and image_url and image_url != existing[2]:
+        # fiyat aynı, görsel yeni/değişmiş: fiyat geçişi sayılmayan güncelleme
+        product_name = existing[1]
+        await db_update_queue.put({
+            "product_link": product_link,
+            "product_id": product_id,
+            "product_price": price,
+            "image_url": image_url,
+            "now": now,
+            "is_update": True,
+            "image_only": True
+        })
+    elif existing and not price_changed(existing[0], price):
+        product_name = existing[1]
+        await db_update_queue.put({
+            "product_link": product_link,
+            "product_id": product_id,
+            "now": now,
+            "is_seen": True
+        })
+    elif existing:
         product_name = existing[1]
-        db_update_queue.put_nowait({
+        await db_update_queue.put({
             "product_link": product_link,
+            "product_id": product_id,
             "product_price": price,
+            "image_url": image_url,
             "now": now,
             "is_update": True
         })
     else:
         product_name = extract_product_name_from_url(product_link)
-        db_update_queue.put_nowait({
+        await db_update_queue.put({
             "product_link": product_link,
+            "product_id": product_id,
             "product_name": product_name,
             "product_price": price,
+            "image_url": image_url,
             "now": now
         })
 
-    # akakçe fiyatını al
-    try:
-        akak_price = await get_akakce_primary_price(product_name)
-    except:
-        akak_price = None
-
-    if akak_price is not None:
-        diff = price - akak_price
-
-        # **ÖNCE**: eğer daha önce bildirdiğimiz fiyattan şu anki fiyat yüksekse,
-        # bir sonraki düşüşte yeniden bildirim atabilmek için sıfırla
-        last_notified = state["notified_prices"].get(product_link)
-        if last_notified is not None and price > last_notified:
-            del state["notified_prices"][product_link]
-
-        # **SONRA**: sadece diff ≤ -1500 ve fiyat, son bildirilen fiyattan **daha düşük**se bildirim
-        last_notified = state["notified_prices"].get(product_link)
-        if diff <= -1000 and (last_notified is None or price < last_notified):
-            # bildirim yükle
-            payload = {
-                "project": "medios",
-                "message": (
-                    f"{'Güncelleme' if existing else 'Yeni Fırsat'}:\n"
-                    f"{product_name}\n"
-                    f"{product_link}\n"
-                    f"Fiyat: {formatted}\n"
-                    f"Akakçeden: {format_price_to_user_friendly(abs(diff))} daha ucuz!\n"
-                    f"Time: {now}"
-                )
-            }
-            notification_queue.put_nowait(json.dumps(payload))
-
-            # telegram
-            img = get_cache_filename(product_link)
-            asyncio.create_task(send_telegram_notification(
-                f"{product_name}\n{product_link}\n"
-                f"Fiyat: {formatted}\n"
-                f"Akakçeden: {format_price_to_user_friendly(abs(diff))} daha ucuz!",
-                img
-            ))
+    return {
+        "product_link": product_link,
+        "product_name": product_name,
+        "price": price,
+        "image_url": image_url or (existing[2] if existing else None),
+        "now": now,
+        "existing": bool(existing)
+    }
 
-            # son bildirim fiyatını güncelle
-            state["notified_prices"][product_link] = price
+async def ensure_deal_image(product_link: str, image_url: str = None) -> str:
+    """
+    Görsel cache'te yoksa (veya image_url'den farklı bir görselse) ön yükleme kuyruğunun
+    önüne geçerek indirir ve cache yolunu döner.
+    Sepette yakalanan image_url varsa ürün sayfası açılmadan doğrudan o indirilir.
+    Görsel NOTIFY_IMAGE_WAIT içinde gelmezse beklemeden döner, indirme sürer.
+    """
+    img = get_cache_filename(product_link)
+    if not thumbnail_cache.has(product_link, image_url):
+        try:
+            await asyncio.wait_for(
+                image_fetcher.get_cached_preview_image(product_link, PRIORITY_NOTIFY, image_url),
+                timeout=NOTIFY_IMAGE_WAIT
+            )
+        except asyncio.TimeoutError:
+            logger.warning("ensure_deal_image: Görsel %s sn içinde alınamadı: %s", NOTIFY_IMAGE_WAIT, product_link)
+            flush_logs()
+    thumbnail_cache.touch(img)
+    return img
 
+async def send_deal_notification(message: str, product_link: str, image_url: str = None):
+    """
+    Fırsatı (varsa görseliyle) tek bildirim olarak Telegram'a gönderir.
+    """
+    img = await ensure_deal_image(product_link, image_url)
+    await send_telegram_notification(message, img)
+
+def notify_deal(deal: dict, notification_queue: asyncio.Queue):
+    """
+    Tek fırsatı ZMQ kuyruğuna koyar ve Telegram bildirimini arka planda başlatır.
+    """
+    payload = {
+        "project": "medios",
+        "message": (
+            f"{'Güncelleme' if deal['existing'] else 'Yeni Fırsat'}:\n"
+            f"{deal_text(deal)}\n"
+            f"Time: {deal['now']}"
+        )
+    }
+    notification_queue.put_nowait(json.dumps(payload))
+    telegram_service.track(send_deal_notification(deal_text(deal), deal["product_link"], deal.get("image_url")))
+
+async def send_deal_digest(deals: list[dict]):
+    """
+    Sıralı fırsatları DIGEST_MODE'a göre gönderir. media: görseli olanlar en fazla 10'luk
+    sendMediaGroup albümleri halinde, görseli olmayanlar veya gönderilemeyen albümler özet
+    mesajında; summary: hepsi özet mesajında (Telegram sınırına göre bölünür).
+    """
+    rest = deals
+    if DIGEST_MODE == "media":
+        images = await asyncio.gather(
+            *(ensure_deal_image(deal["product_link"], deal.get("image_url")) for deal in deals)
+        )
+        # Dosya kontrolleri event loop'u bloklamasın; hepsi tek thread çağrısında yapılır
+        present = await asyncio.to_thread(lambda: [os.path.exists(img) for img in images])
+        with_image = [(deal, img) for deal, img, ok in zip(deals, images, present) if ok]
+        rest = [deal for deal, ok in zip(deals, present) if not ok]
+        for group in media_groups(with_image):
+            if len(group) == 1:
+                deal, img = group[0]
+                sent = await send_telegram_notification(deal_text(deal), img)
+            else:
+                sent = await telegram_service.send_media_group([(deal_text(deal), img) for deal, img in group])
+            if not sent:
+                rest.extend(deal for deal, _ in group)
+        rest = rank_deals(rest)
+    for message in summary_messages(rest) if rest else []:
+        await send_telegram_notification(message)
+
+def flush_deal_digest(deals: list[dict], notification_queue: asyncio.Queue):
+    """
+    Döngüde biriken fırsatları gönderir; tek fırsat normal bildirim olarak gider.
+    Birden fazlaysa indirime göre sıralanır, ZMQ'ya tek özet mesajı konur.
+    """
+    if not deals:
+        return
+    if len(deals) == 1:
+        notify_deal(deals[0], notification_queue)
+        return
+    ranked = rank_deals(deals)
+    notification_queue.put_nowait(json.dumps({"project": "medios", "message": summary_text(ranked)}))
+    telegram_service.track(send_deal_digest(ranked))
+    metrics.inc("deal_digests")
+    logger.info("flush_deal_digest: %d fırsat özet olarak gönderiliyor (%s).", len(ranked), DIGEST_MODE)
     flush_logs()
 
-async def get_dynamic_price_text(element) -> str | None:
-    sel1 = "div[data-test='mms-price'] span[aria-hidden='true']"
-    el = await element.query_selector(sel1)
-    if el:
-        txt = (await el.text_content()).strip()
-        if txt.startswith("₺") and re.search(r"\d", txt):
-            return txt
-
-    sel2 = "div[data-test='mms-price'] span.sc-e0c7d9f7-0"
-    els = await element.query_selector_all(sel2)
-    for e in els:
-        txt = (await e.text_content()).strip()
-        if txt.startswith("₺") and re.search(r"\d", txt):
-            return txt
-
-    return None
-
-async def process_product_element(
-    product_element,
-    page_url: str,
+async def evaluate_deal(
+    product: dict,
+    akak_price: float | None,
+    notification_queue: asyncio.Queue,
+    state: dict,
+    digest: list | None = None
+):
+    """
+    Ürün fiyatını Akakçe fiyatıyla karşılaştırır, fırsat varsa bildirim gönderir.
+    digest verilmişse fırsat döngü sonunda toplu gönderilmek üzere listeye eklenir.
+    """
+    if akak_price is None:
+        return
+
+    product_link = product["product_link"]
+    product_name = product["product_name"]
+    price = product["price"]
+    diff = price - akak_price
+
+    # **ÖNCE**: eğer daha önce bildirdiğimiz fiyattan şu anki fiyat yüksekse,
+    # bir sonraki düşüşte yeniden bildirim atabilmek için sıfırla
+    last_notified = state["notified_prices"].get(product_link)
+    if last_notified is not None and price > last_notified:
+        del state["notified_prices"][product_link]
+
+    # **SONRA**: sadece diff ≤ -1500 ve fiyat, son bildirilen fiyattan **daha düşük**se bildirim
+    last_notified = state["notified_prices"].get(product_link)
+    if diff <= -1000 and (last_notified is None or price < last_notified):
+        deal = {
+            "product_link": product_link,
+            "product_name": product_name,
+            "price": price,
+            "saving": abs(diff),
+            "image_url": product.get("image_url"),
+            "existing": product["existing"],
+            "now": product["now"]
+        }
+        if digest is not None:
+            digest.append(deal)
+        else:
+            notify_deal(deal, notification_queue)
+        metrics.inc("deals_notified")
+
+        # son bildirim fiyatını güncelle
+        state["notified_prices"][product_link] = price
+
+async def process_product(
+    product_link: str,
+    product_price_str: str,
     pool,
     db_update_queue: asyncio.Queue,
     notification_queue: asyncio.Queue,
     state: dict
 ):
-    try:
-        link_el = await product_element.query_selector("a[data-test='mms-router-link']")
-        if not link_el:
-            return
-        href = await link_el.get_attribute("href")
-        price_txt = await get_dynamic_price_text(product_element) or "Price Not Specified"
-        await process_product(href, price_txt, pool,
-                              db_update_queue, notification_queue, state)
-    except Exception as e:
-        logger.error(f"process_product_element hata: {e}")
-        flush_logs()
+    product = await prepare_product(product_link, product_price_str, pool, db_update_queue, state)
+
+    # akakçe fiyatını al
+    akak_price = await get_akakce_primary_price(product["product_name"])
+    await evaluate_deal(product, akak_price, notification_queue, state)
+
+# Sepetteki tüm ürünleri tek bir page.evaluate çağrısıyla çıkarır.
+# Fiyat için önce aria-hidden span, yoksa yedek span sınıfı denenir.
+# Sepet yoksa null, varsa {href, price_text, image_url, line_item_id} listesi döner.
+EXTRACT_BASKET_JS = """
+(basketSelector) => {
+    const basket = document.querySelector(basketSelector);
+    if (!basket) return null;
+    const isPrice = (t) => !!t && t.startsWith("₺") && /\\d/.test(t);
+    const priceOf = (item) => {
+        const primary = item.querySelector("div[data-test='mms-price'] span[aria-hidden='true']");
+        if (primary) {
+            const txt = primary.textContent.trim();
+            if (isPrice(txt)) return txt;
+        }
+        for (const span of item.querySelectorAll("div[data-test='mms-price'] span.sc-e0c7d9f7-0")) {
+            const txt = span.textContent.trim();
+            if (isPrice(txt)) return txt;
+        }
+        return null;
+    };
+    const imageOf = (item) => {
+        const img = item.querySelector("picture img, img");
+        if (!img) return null;
+        const candidates = (img.getAttribute("srcset") || "").split(",")
+            .map((c) => c.trim().split(" ")[0]).filter((c) => c);
+        for (const url of [candidates[candidates.length - 1], img.getAttribute("data-src"), img.getAttribute("src")]) {
+            if (url && !url.startsWith("data:")) return url;
+        }
+        return null;
+    };
+    const items = [];
+    for (const item of basket.querySelectorAll("div[data-test^='basket-lineitem-']")) {
+        const link = item.querySelector("a[data-test='mms-router-link']");
+        if (!link) continue;
+        items.push({
+            href: link.getAttribute("href"),
+            price_text: priceOf(item),
+            image_url: imageOf(item),
+            line_item_id: item.getAttribute("data-test").slice("basket-lineitem-".length)
+        });
+    }
+    return items;
+}
+"""
+
+async def process_basket_items(
+    items: list[dict],
+    pool,
+    db_update_queue: asyncio.Queue,
+    notification_queue: asyncio.Queue,
+    state: dict
+):
+    """
+    Sepetten çıkarılmış ürünleri DB kuyruğuna koyar, Akakçe fiyatlarını
+    tek geçişte çözer ve fırsatları değerlendirir.
+    """
+    products = []
+    for item in items:
+        href = item.get("href")
+        if not href:
+            continue
+        try:
+            products.append(await prepare_product(
+                href, item.get("price_text") or "Price Not Specified",
+                pool, db_update_queue, state, item.get("image_url")
+            ))
+        except Exception as e:
+            logger.error(f"process_basket_items hata ({href}): {e}")
+            flush_logs()
+
+    # akakçe fiyatlarını tek geçişte çöz
+    with metrics.timer("akakce_lookup"):
+        akak_prices = await akakce_resolver.resolve(p["product_name"] for p in products)
+    # DIGEST_MODE açıksa döngünün fırsatları toplanıp sonda birlikte gönderilir
+    digest = [] if digest_enabled() else None
+    for product in products:
+        await evaluate_deal(
+            product, akak_prices.get(product["product_name"]),
+            notification_queue, state, digest
+        )
+    if digest:
+        flush_deal_digest(digest, notification_queue)
 
 async def scrape_page_with_context(
     context,
@@ -155,95 +351,62 @@ async def scrape_page_with_context(
 ):
     page = await context.new_page()
     try:
-        await page.goto(url, wait_until="domcontentloaded", timeout=15000)
+        with metrics.timer("page_goto"):
+            await page.goto(url, wait_until="domcontentloaded", timeout=15000)
         await asyncio.sleep(0)
 
         # Sepet konteyneri
-        try:
-            await page.wait_for_selector("div[data-test='mms-seller-basket']", timeout=15000)
-        except:
-            pass
-        basket = await page.query_selector("div[data-test='mms-seller-basket']")
-        if not basket:
+        with metrics.timer("basket_wait"):
+            try:
+                await page.wait_for_selector(BASKET_SELECTOR, timeout=15000)
+            except:
+                pass
+        with metrics.timer("dom_extract"):
+            items = await page.evaluate(EXTRACT_BASKET_JS, BASKET_SELECTOR)
+        if items is None:
             logger.warning("scrape_page: Basket bulunamadı")
             return
 
-        items = await basket.query_selector_all("div[data-test^='basket-lineitem-']")
         logger.info(f"scrape_page: Ürün elementi sayısı: {len(items)}")
         flush_logs()
 
-        # paralel işleme
-        await asyncio.gather(*[
-            process_product_element(
-                it, url, pool,
-                db_update_queue, notification_queue, state
-            ) for it in items
-        ])
+        await process_basket_items(items, pool, db_update_queue, notification_queue, state)
     finally:
         await page.close()
         flush_logs()
+
+async def scrape_basket_http(
+    client,
+    url: str,
+    pool,
+    db_update_queue: asyncio.Queue,
+    notification_queue: asyncio.Queue,
+    state: dict
+) -> bool:
+    """
+    Sepeti tarayıcı olmadan HTTP ile çekip işler.
+    Challenge, parse hatası veya boş sepette False döner; çağıran Playwright yoluna düşer.
+    """
+    try:
+        with metrics.timer("basket_http"):
+            items = await fetch_basket_items(client, url)
+    except BasketFetchError as e:
+        logger.warning(f"scrape_basket_http: HTTP yolu başarısız, tarayıcıya geçiliyor: {e}")
+        flush_logs()
+        metrics.inc("basket_http_fallbacks")
+        return False
+
+    logger.info(f"scrape_basket_http: Ürün elementi sayısı: {len(items)}")
+    flush_logs()
+    await process_basket_items(items, pool, db_update_queue, notification_queue, state)
+    return True
+
 async def get_akakce_primary_price(product_name: str) -> float | None:
     """
     Akakçe DB’den ürüne ait üç satıcı + fiyatı alır
     ve öncelik sırasına göre en uygun fiyatı döner.
     """
     logger.debug("get_akakce_primary_price: Urun adi: %s", product_name)
-    flush_logs()
-    conn = None
-    try:
-        conn = await aiomysql.connect(
-            user=DATABASE_CONFIG['user'],
-            password=os.getenv("DB_PASSWORD"),
-            host=os.getenv("DB_HOST"),
-            port=int(os.getenv("DB_PORT", "3306")),
-            db="akakce",
-            autocommit=True,
-        )
-        async with conn.cursor() as cur:
-            query = """
-                SELECT satici_bir,    satici_bir_fiyat,
-                       satici_iki,    satici_iki_fiyat,
-                       satici_uc,     satici_uc_fiyat
-                FROM products
-                WHERE urun_adi = %s
-                LIMIT 1
-            """
-            await cur.execute(query, (product_name,))
-            row = await cur.fetchone()
-            logger.debug("get_akakce_primary_price: Sorgu sonucu: %s", row)
-            flush_logs()
-
-            if not row:
-                logger.warning("get_akakce_primary_price: AK kaydı yok: %s", product_name)
-                flush_logs()
-                return None
-
-            s1, p1, s2, p2, s3, p3 = row
-            # normalize et
-            n1 = (s1 or "").strip().lower().replace(" ", "")
-            n2 = (s2 or "").strip().lower().replace(" ", "")
-
-            # 1) İlk satıcı “mediamarkt” ise:
-            #       → ikincil “pttavm” ise p3, değilse p2
-            # 2) İlk satıcı “pttavm” ise:
-            #       → ikincil “mediamarkt” ise p3, değilse p2
-            # 3) Diğer tüm durumlar → p1
-            if n1 == "mediamarkt":
-                chosen = p3 if n2 == "pttavm" else p2
-            elif n1 == "pttavm":
-                chosen = p3 if n2 == "mediamarkt" else p2
-            else:
-                chosen = p1
-
-            logger.debug("get_akakce_primary_price: Seçilen fiyat: %s", chosen)
-            flush_logs()
-            return float(chosen) if chosen is not None else None
-
-    except Exception as e:
-        logger.exception("get_akakce_primary_price: Hata (%s): %s", product_name, e)
-        flush_logs()
-        return None
-
-    finally:
-        if conn:
-            conn.close()
+    with metrics.timer("akakce_lookup"):
+        prices = await akakce_resolver.resolve([product_name])
+    return prices.get(product_name)
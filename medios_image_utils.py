@@ -1,7 +1,6 @@
 ﻿# medios_image_utils.py
 
 import os
-import hashlib
 import requests
 from bs4 import BeautifulSoup
 import urllib.parse
@@ -10,8 +9,8 @@ from playwright.async_api import async_playwright
 from PIL import Image
 from io import BytesIO
 from logconfig import logger, flush_logs
+from thumbnail_cache import CACHE_DIR, thumbnail_cache
 
-CACHE_DIR = "cache_previews"
 if not os.path.exists(CACHE_DIR):
     os.makedirs(CACHE_DIR)
     logger.info("CACHE_DIR created: %s", CACHE_DIR)
@@ -21,12 +20,11 @@ else:
     flush_logs()
 
 def get_cache_filename(url: str) -> str:
-    logger.debug("get_cache_filename: URL: %s", url)
-    flush_logs()
-    hash_val = hashlib.md5(url.encode('utf-8')).hexdigest()
-    filename = os.path.join(CACHE_DIR, f"{hash_val}.png")
-    logger.debug("get_cache_filename: Generated filename: %s", filename)
-    flush_logs()
+    """
+    Linkin küçük önizlemesinin cache yolu: cache_previews/<ilk 2 hex>/<md5>.jpg (veya .webp).
+    """
+    filename = thumbnail_cache.path_for(url)
+    logger.debug("get_cache_filename: %s -> %s", url, filename)
     return filename
 
 def fetch_preview_image(url: str) -> Image.Image:
@@ -127,7 +125,6 @@ def get_cached_preview_image(url: str) -> str:
     cache_file = get_cache_filename(url)
     if os.path.exists(cache_file):
         logger.info("get_cached_preview_image: Cache already exists: %s", cache_file)
-        flush_logs()
         return cache_file
 
     logger.info("get_cached_preview_image: Cache not found, downloading: %s", url)
@@ -141,7 +138,7 @@ def get_cached_preview_image(url: str) -> str:
 
     if pil_image:
         try:
-            pil_image.save(cache_file)
+            thumbnail_cache.write(pil_image, cache_file, url)
             logger.info("get_cached_preview_image: Image saved to cache: %s", cache_file)
             flush_logs()
             return cache_file
@@ -4,8 +4,10 @@
 import time
 import asyncio
 from logconfig import logger, flush_logs
+from config import PRODUCTS_TABLE
 from database import db_bulk_worker
-from dependencies import zmq_publish_message
+from zmq_publisher import zmq_publisher, ZMQ_BATCH_SIZE
+from metrics import metrics
 
 async def wait_for_products(pool, expected_minimum=1, timeout=10):
     """
@@ -15,7 +17,7 @@ async def wait_for_products(pool, expected_minimum=1, timeout=10):
     while time.time() - start < timeout:
         async with pool.acquire() as conn:
             async with conn.cursor() as cur:
-                await cur.execute("SELECT COUNT(*) FROM products")
+                await cur.execute(f"SELECT COUNT(*) FROM {PRODUCTS_TABLE}")
                 cnt = (await cur.fetchone())[0]
                 logger.debug("wait_for_products: %d kayıt var", cnt)
                 flush_logs()
@@ -24,19 +26,43 @@ async def wait_for_products(pool, expected_minimum=1, timeout=10):
         await asyncio.sleep(0.5)
     return 0
 
-async def notification_worker(notification_queue: asyncio.Queue):
+def _drain_queue(notification_queue: asyncio.Queue, batch: list, limit: int):
+    while len(batch) < limit:
+        try:
+            batch.append(notification_queue.get_nowait())
+        except asyncio.QueueEmpty:
+            break
+
+async def notification_worker(notification_queue: asyncio.Queue, publisher=zmq_publisher,
+                              batch_size: int = ZMQ_BATCH_SIZE):
     """
     notification_queue’dan gelen JSON’ları merkezi servise yollayan worker.
+    İlk mesajı bekler, o an kuyrukta birikmiş olanları da alıp tek multipart batch olarak gönderir.
+    İptal edildiğinde kuyrukta kalanları ve henüz gönderimine başlanmamış batch'i gönderir.
     """
     logger.info("notification_worker: Başlatıldı")
     flush_logs()
     while True:
+        batch = []
         try:
-            msg = await notification_queue.get()
-            logger.debug("notification_worker: %s", msg)
-            flush_logs()
-            await zmq_publish_message(msg)
-            flush_logs()
+            batch.append(await notification_queue.get())
+            _drain_queue(notification_queue, batch, batch_size)
+            logger.debug("notification_worker: %d mesaj", len(batch))
+            # send_multipart iptal gelmeden soketin kuyruğuna almış olabilir; kapanışta tekrar
+            # gönderilip tüketicilere çift bildirim gitmesin diye batch gönderime başlarken boşaltılır
+            sending, batch = batch, []
+            with metrics.timer("notification_publish"):
+                await publisher.send_batch(sending)
+        except asyncio.CancelledError:
+            _drain_queue(notification_queue, batch, float("inf"))
+            if batch:
+                logger.info("notification_worker: Kapanışta %d mesaj gönderiliyor.", len(batch))
+                flush_logs()
+                try:
+                    await publisher.send_batch(batch)
+                except Exception as e:
+                    logger.error("notification_worker: Kapanış gönderiminde hata: %s", e)
+            raise
         except Exception as e:
             logger.error("notification_worker hata: %s", e)
             flush_logs()
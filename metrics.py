@@ -0,0 +1,221 @@
+#!/usr/bin/env python
+# metrics.py
+
+import os
+import json
+import time
+import asyncio
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from logconfig import logger, flush_logs
+
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+# 0: HTTP endpoint kapalı
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))
+# Boş: döngü başına JSON snapshot yazılmaz
+METRICS_SNAPSHOT_FILE = os.getenv("METRICS_SNAPSHOT_FILE", "")
+METRICS_PREFIX = "medios"
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram:
+    """
+    Sabit kovalı gecikme histogramı (Prometheus "le" semantiği).
+    """
+
+    __slots__ = ("buckets", "counts", "sum", "count", "max")
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.sum += value
+        self.count += 1
+        if value > self.max:
+            self.max = value
+        i = bisect_left(self.buckets, value)
+        if i < len(self.counts):
+            self.counts[i] += 1
+
+    def cumulative(self):
+        total = 0
+        for le, n in zip(self.buckets, self.counts):
+            total += n
+            yield le, total
+
+
+class Metrics:
+    """
+    Scrape döngüsünün aşama süreleri (histogram), sayaçlar ve gauge'lar.
+    Gauge'lar kayıtlı fonksiyonlardan okunma anında hesaplanır (kuyruk derinlikleri, pool durumu).
+    Tümü event loop thread'inden güncellendiği için kilit kullanılmaz.
+    """
+
+    def __init__(self, prefix: str = METRICS_PREFIX):
+        self.prefix = prefix
+        self.histograms = {}
+        self.counters = {}
+        self._gauges = {}
+        self._server = None
+        self.started_at = time.time()
+
+    def observe(self, stage: str, seconds: float):
+        hist = self.histograms.get(stage)
+        if hist is None:
+            hist = self.histograms[stage] = Histogram()
+        hist.observe(seconds)
+
+    @contextmanager
+    def timer(self, stage: str):
+        """
+        `with metrics.timer("page_goto"): await page.goto(...)` şeklinde aşama süresi ölçer.
+        """
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - t0)
+
+    def inc(self, name: str, value: float = 1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def register_gauge(self, name: str, fn, kind: str = "gauge"):
+        """
+        fn() okunma anında sayı döner. Dışarıda tutulan birikimli
+        değerler (ör. db_worker_stats) için kind="counter" verilir.
+        """
+        self._gauges[name] = (fn, kind)
+
+    def _gauge_values(self) -> dict:
+        values = {}
+        for name, (fn, kind) in self._gauges.items():
+            try:
+                value = fn()
+            except Exception as e:
+                logger.debug("Metrics: Gauge okunamadı (%s): %s", name, e)
+                continue
+            if value is not None:
+                values[name] = (float(value), kind)
+        return values
+
+    def render(self) -> str:
+        """
+        Prometheus text exposition formatı (0.0.4).
+        """
+        p = self.prefix
+        lines = []
+        if self.histograms:
+            lines.append(f"# HELP {p}_stage_duration_seconds Scrape döngüsü aşama süreleri.")
+            lines.append(f"# TYPE {p}_stage_duration_seconds histogram")
+            for stage, hist in sorted(self.histograms.items()):
+                for le, n in hist.cumulative():
+                    lines.append(f'{p}_stage_duration_seconds_bucket{{stage="{stage}",le="{le}"}} {n}')
+                lines.append(f'{p}_stage_duration_seconds_bucket{{stage="{stage}",le="+Inf"}} {hist.count}')
+                lines.append(f'{p}_stage_duration_seconds_sum{{stage="{stage}"}} {hist.sum:.6f}')
+                lines.append(f'{p}_stage_duration_seconds_count{{stage="{stage}"}} {hist.count}')
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"# TYPE {p}_{name}_total counter")
+            lines.append(f"{p}_{name}_total {value}")
+        for name, (value, kind) in sorted(self._gauge_values().items()):
+            metric = f"{p}_{name}_total" if kind == "counter" else f"{p}_{name}"
+            lines.append(f"# TYPE {metric} {kind}")
+            lines.append(f"{metric} {value}")
+        lines.append(f"# TYPE {p}_uptime_seconds gauge")
+        lines.append(f"{p}_uptime_seconds {time.time() - self.started_at:.1f}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> dict:
+        return {
+            "time": time.time(),
+            "stages": {
+                stage: {
+                    "count": hist.count,
+                    "sum": round(hist.sum, 6),
+                    "avg": round(hist.sum / hist.count, 6) if hist.count else 0.0,
+                    "max": round(hist.max, 6),
+                }
+                for stage, hist in self.histograms.items()
+            },
+            "counters": dict(self.counters),
+            "gauges": {name: value for name, (value, _) in self._gauge_values().items()},
+        }
+
+    async def write_snapshot(self, path: str = METRICS_SNAPSHOT_FILE, **extra):
+        """
+        Snapshot'ı (ve döngüye ait ek alanları) JSON olarak yazar; path boşsa bir şey yapmaz.
+        Dosya önce geçici isimle yazılıp değiştirilir, okuyan taraf yarım dosya görmez.
+        """
+        if not path:
+            return
+        data = self.snapshot()
+        data.update(extra)
+
+        def _write():
+            tmp = path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp, path)
+
+        try:
+            await asyncio.to_thread(_write)
+        except Exception as e:
+            logger.warning("Metrics: Snapshot yazılamadı: %s", e)
+            flush_logs()
+
+    async def _handle(self, reader, writer):
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+            while True:
+                line = await asyncio.wait_for(reader.readline(), timeout=5)
+                if line in (b"\r\n", b"\n", b""):
+                    break
+            parts = request_line.decode("latin-1").split()
+            path = parts[1].split("?", 1)[0] if len(parts) > 1 else "/"
+            if path in ("/", "/metrics"):
+                status, ctype, body = "200 OK", "text/plain; version=0.0.4; charset=utf-8", self.render()
+            elif path == "/snapshot":
+                status, ctype, body = "200 OK", "application/json; charset=utf-8", json.dumps(self.snapshot())
+            else:
+                status, ctype, body = "404 Not Found", "text/plain; charset=utf-8", "not found\n"
+            payload = body.encode("utf-8")
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: {ctype}\r\n"
+                f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode("latin-1") + payload
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        except Exception as e:
+            logger.warning("Metrics: İstek işlenemedi: %s", e)
+        finally:
+            writer.close()
+
+    async def start_server(self, host: str = METRICS_HOST, port: int = METRICS_PORT):
+        """
+        /metrics (Prometheus) ve /snapshot (JSON) sunan yerel HTTP endpoint'ini açar.
+        """
+        if self._server is not None or not port:
+            return
+        try:
+            self._server = await asyncio.start_server(self._handle, host, port)
+        except OSError as e:
+            logger.error("Metrics: %s:%s dinlenemedi: %s", host, port, e)
+            flush_logs()
+            return
+        logger.info("Metrics: http://%s:%s/metrics dinleniyor.", host, port)
+        flush_logs()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+
+metrics = Metrics()
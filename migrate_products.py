@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+# migrate_products.py
+#
+# products (v1) tablosunu products_v2'ye parça parça taşır:
+#     python migrate_products.py [--batch-size 1000] [--pause 0.05]
+#
+# Çevrimiçi çalışır: her batch ayrı commit edilir ve mevcut v2 satırlarının
+# daha yeni fiyat/tarih bilgisi ezilmez. Scraper v1'e yazarken bir kez,
+# PRODUCTS_SCHEMA_VERSION=2'ye geçtikten sonra aradaki farkı kapatmak için
+# tekrar çalıştırılabilir.
+
+import sys
+import asyncio
+import argparse
+from datetime import datetime
+import aiomysql
+
+from config import DATABASE_CONFIG
+from logconfig import logger, flush_logs
+from database import PRODUCTS_V2_DDL, add_image_url_column
+from utilities import extract_product_id
+
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+UPSERT_V2 = """
+    INSERT INTO products_v2 (product_id, product_link, product_name, product_price, first_seen_date, last_update_date, image_url)
+    VALUES (%s, %s, %s, %s, %s, %s, %s) AS new
+    ON DUPLICATE KEY UPDATE
+        product_name = COALESCE(products_v2.product_name, new.product_name),
+        image_url = IF(new.last_update_date > products_v2.last_update_date,
+                       COALESCE(new.image_url, products_v2.image_url),
+                       COALESCE(products_v2.image_url, new.image_url)),
+        first_seen_date = LEAST(products_v2.first_seen_date, new.first_seen_date),
+        product_price = IF(new.last_update_date > products_v2.last_update_date,
+                           new.product_price, products_v2.product_price),
+        last_update_date = GREATEST(products_v2.last_update_date, new.last_update_date)
+"""
+
+
+def parse_v1_date(value, fallback: datetime) -> datetime:
+    """
+    v1'deki TEXT tarihini DATETIME'a çevirir; boş veya bozuksa fallback döner.
+    """
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.strptime((value or "").strip(), DATE_FORMAT)
+    except ValueError:
+        return fallback
+
+
+def convert_row(row, now: datetime):
+    """
+    v1 satırını v2 parametrelerine çevirir; URL'den ID çıkmazsa None döner.
+    """
+    link, name, price, first_seen, last_update, image_url = row
+    product_id = extract_product_id(link)
+    if product_id is None:
+        return None
+    last = parse_v1_date(last_update, now)
+    first = parse_v1_date(first_seen, last)
+    return (product_id, link, name, round(float(price), 2) if price is not None else None, first, last, image_url)
+
+
+async def migrate(batch_size: int, pause: float) -> dict:
+    stats = {"read": 0, "written": 0, "skipped": 0}
+    now = datetime.now().replace(microsecond=0)
+    config = {k: v for k, v in DATABASE_CONFIG.items() if k not in ('minsize', 'maxsize')}
+    reader = await aiomysql.connect(**config)
+    writer = await aiomysql.connect(**config)
+    try:
+        async with writer.cursor() as wcur:
+            await wcur.execute(PRODUCTS_V2_DDL)
+            # Tablolar image_url eklenmeden önce oluşturulmuş olabilir
+            for table in ("products", "products_v2"):
+                await add_image_url_column(wcur, table)
+            await writer.commit()
+
+        async with reader.cursor(aiomysql.SSCursor) as rcur:
+            await rcur.execute(
+                "SELECT product_link, product_name, product_price, first_seen_date, last_update_date, image_url FROM products"
+            )
+            while True:
+                rows = await rcur.fetchmany(batch_size)
+                if not rows:
+                    break
+                stats["read"] += len(rows)
+                data = []
+                for row in rows:
+                    converted = convert_row(row, now)
+                    if converted is None:
+                        stats["skipped"] += 1
+                        logger.warning("migrate_products: ID çıkarılamadı, atlandı: %s", row[0])
+                    else:
+                        data.append(converted)
+                if data:
+                    async with writer.cursor() as wcur:
+                        await wcur.executemany(UPSERT_V2, data)
+                    await writer.commit()
+                    stats["written"] += len(data)
+                logger.info("migrate_products: %d okundu, %d yazıldı, %d atlandı.",
+                            stats["read"], stats["written"], stats["skipped"])
+                flush_logs()
+                if pause:
+                    await asyncio.sleep(pause)
+    finally:
+        reader.close()
+        writer.close()
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="products tablosunu products_v2 şemasına taşır.")
+    parser.add_argument("--batch-size", type=int, default=1000, help="her commit'teki satır sayısı")
+    parser.add_argument("--pause", type=float, default=0.05, help="batch'ler arası bekleme (sn)")
+    args = parser.parse_args()
+    try:
+        stats = asyncio.run(migrate(args.batch_size, args.pause))
+    except Exception as e:
+        logger.error("migrate_products: Hata: %s", e)
+        flush_logs()
+        sys.exit(1)
+    logger.info("migrate_products: Tamamlandı: %s", stats)
+    flush_logs()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+#!/usr/bin/env python
+# notify_dedupe.py
+
+import os
+import time
+import sqlite3
+import asyncio
+import threading
+from collections import OrderedDict
+
+from logconfig import logger, flush_logs
+
+NOTIFY_DEDUPE_FILE = os.getenv("NOTIFY_DEDUPE_FILE", "notified_prices.sqlite3")
+# Bu kadar saat önce bildirilmiş fiyat unutulur; aynı fiyat tekrar bildirilebilir
+NOTIFY_DEDUPE_TTL_HOURS = float(os.getenv("NOTIFY_DEDUPE_TTL_HOURS", "72"))
+# Bellekte tutulan en fazla ürün; aşılınca en uzun süredir bakılmayan bellekten atılır,
+# dosyadaki kaydı TTL dolana kadar kalır
+NOTIFY_DEDUPE_MAX_ENTRIES = int(os.getenv("NOTIFY_DEDUPE_MAX_ENTRIES", "50000"))
+# Yazılacak değişiklik olmasa da diğer süreçlerin kayıtları en geç bu kadar saniyede bir okunur
+NOTIFY_DEDUPE_SYNC_INTERVAL = float(os.getenv("NOTIFY_DEDUPE_SYNC_INTERVAL", "30"))
+
+_MISSING = object()
+
+
+class NotifiedPriceStore:
+    """
+    Son bildirilen fiyatlar (product_link -> fiyat); state["notified_prices"] yerine geçen,
+    dict gibi kullanılan, SQLite (WAL) dosyasında kalıcı depo.
+    Okuma/yazma bellekteki LRU üzerinden yapılır; değişiklikler biriktirilir ve flush()
+    ile tek transaction'da dosyaya yazılır (db_bulk_worker her batch'ten sonra çağırır).
+    TTL'i geçen kayıtlar yok sayılır ve silinir.
+    Her yazma ve silme notified_changes günlüğüne artan sıra numarasıyla da eklenir;
+    aynı dosyayı kullanan diğer süreçlerin değişiklikleri (silmeler dahil) flush sırasında
+    bu numaraya göre belleğe alınır, saatlere güvenilmez.
+    """
+
+    def __init__(
+        self,
+        path: str = NOTIFY_DEDUPE_FILE,
+        ttl_hours: float = NOTIFY_DEDUPE_TTL_HOURS,
+        max_entries: int = NOTIFY_DEDUPE_MAX_ENTRIES,
+        sync_interval: float = NOTIFY_DEDUPE_SYNC_INTERVAL
+    ):
+        self.path = path
+        self.ttl = ttl_hours * 3600
+        self.max_entries = max_entries
+        self.sync_interval = sync_interval
+        # product_link -> (price, notified_at); baştaki en uzun süredir bakılmayan
+        self._entries = OrderedDict()
+        self._upserts = {}
+        # product_link -> silinme zamanı
+        self._deletes = {}
+        # notified_changes'ta okunan son sıra numarası
+        self._last_seq = 0
+        self._last_flush = 0.0
+        self._loaded = False
+        self._conn = None
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS notified_prices (
+                    product_link TEXT PRIMARY KEY,
+                    price REAL NOT NULL,
+                    notified_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_notified_at ON notified_prices (notified_at)")
+            # price NULL = silme kaydı; AUTOINCREMENT sıra numaraları TTL temizliğinden sonra da tekrar kullanılmaz
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS notified_changes (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    product_link TEXT NOT NULL,
+                    price REAL,
+                    changed_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_changed_at ON notified_changes (changed_at)")
+            self._conn = conn
+        return self._conn
+
+    def load(self):
+        """
+        Süresi dolmamış kayıtları belleğe alır (açılışta thread'de çağrılmalıdır).
+        Yüklenmişse bir şey yapmaz; bellekteki kayıtlar ve sıra numarası sıfırlanmaz.
+        """
+        if self._loaded:
+            return
+        with self._db_lock:
+            try:
+                conn = self._connect()
+                self._prune(conn)
+                # Kayıtlar ve sıra numarası aynı anlık görüntüden okunur
+                conn.execute("BEGIN")
+                try:
+                    rows = conn.execute(
+                        "SELECT product_link, price, notified_at FROM notified_prices "
+                        "ORDER BY notified_at DESC LIMIT ?",
+                        (self.max_entries,)
+                    ).fetchall()
+                    last_seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM notified_changes").fetchone()[0]
+                finally:
+                    conn.execute("COMMIT")
+            except sqlite3.Error as e:
+                logger.error("NotifiedPriceStore: %s okunamadı, boş başlanıyor: %s", self.path, e)
+                flush_logs()
+                rows, last_seq = [], 0
+        with self._lock:
+            self._entries.clear()
+            for link, price, notified_at in reversed(rows):
+                self._entries[link] = (price, notified_at)
+            self._last_seq = last_seq
+            self._loaded = True
+        logger.info("NotifiedPriceStore: %d bildirim kaydı yüklendi.", len(rows))
+        flush_logs()
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self.load()
+
+    def _expired(self, notified_at: float) -> bool:
+        return notified_at < time.time() - self.ttl
+
+    def get(self, product_link: str, default=None):
+        self._ensure_loaded()
+        with self._lock:
+            entry = self._entries.get(product_link)
+            if entry is None:
+                return default
+            if self._expired(entry[1]):
+                del self._entries[product_link]
+                self._upserts.pop(product_link, None)
+                self._deletes[product_link] = time.time()
+                return default
+            self._entries.move_to_end(product_link)
+            return entry[0]
+
+    def __getitem__(self, product_link: str) -> float:
+        value = self.get(product_link, _MISSING)
+        if value is _MISSING:
+            raise KeyError(product_link)
+        return value
+
+    def __contains__(self, product_link: str) -> bool:
+        return self.get(product_link, _MISSING) is not _MISSING
+
+    def __setitem__(self, product_link: str, price: float):
+        self._ensure_loaded()
+        now = time.time()
+        with self._lock:
+            self._entries[product_link] = (price, now)
+            self._entries.move_to_end(product_link)
+            self._upserts[product_link] = (price, now)
+            self._deletes.pop(product_link, None)
+            # Yalnızca bellek sınırı; taşan kayıt dosyadan ve diğer süreçlerden silinmez
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __delitem__(self, product_link: str):
+        self._ensure_loaded()
+        with self._lock:
+            del self._entries[product_link]
+            self._upserts.pop(product_link, None)
+            self._deletes[product_link] = time.time()
+
+    def pop(self, product_link: str, default=None):
+        value = self.get(product_link, _MISSING)
+        if value is _MISSING:
+            return default
+        del self[product_link]
+        return value
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    @property
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._upserts) + len(self._deletes)
+
+    def flush(self):
+        """
+        Biriken değişiklikleri tek transaction'da yazar, süresi dolanları siler ve
+        başka süreçlerin son okunan sıra numarasından beri yaptığı değişiklikleri
+        belleğe uygular (thread'de çağrılmalıdır).
+        """
+        self._last_flush = time.monotonic()
+        with self._lock:
+            upserts, self._upserts = self._upserts, {}
+            deletes, self._deletes = self._deletes, {}
+            since = self._last_seq
+        with self._db_lock:
+            try:
+                conn = self._connect()
+                own = self._write(conn, upserts, deletes) if upserts or deletes else range(0)
+                rows = conn.execute(
+                    "SELECT seq, product_link, price, changed_at FROM notified_changes "
+                    "WHERE seq > ? ORDER BY seq",
+                    (since,)
+                ).fetchall()
+            except sqlite3.Error as e:
+                logger.error("NotifiedPriceStore: Yazılamadı, sonraki flush'ta denenecek: %s", e)
+                flush_logs()
+                with self._lock:
+                    for link, value in upserts.items():
+                        self._upserts.setdefault(link, value)
+                    for link, deleted_at in deletes.items():
+                        if link not in self._upserts:
+                            self._deletes.setdefault(link, deleted_at)
+                return
+        with self._lock:
+            for seq, link, price, changed_at in rows:
+                # Kendi yazdıklarımız zaten bellekte (bellekten taşanlar geri alınmaz);
+                # henüz yazılmamış yerel değişiklik ise daha yenidir
+                if seq in own or link in self._upserts or link in self._deletes:
+                    continue
+                current = self._entries.get(link)
+                if price is None:
+                    if current is not None and current[1] <= changed_at:
+                        del self._entries[link]
+                elif (current is None or current[1] < changed_at) and not self._expired(changed_at):
+                    self._entries[link] = (price, changed_at)
+            # Dışarıdan gelenler yalnızca bellekten taşar; dosyadaki kayıtlar TTL ile temizlenir
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            if rows:
+                self._last_seq = rows[-1][0]
+
+    def _prune(self, conn: sqlite3.Connection):
+        cutoff = time.time() - self.ttl
+        conn.execute("DELETE FROM notified_prices WHERE notified_at < ?", (cutoff,))
+        conn.execute("DELETE FROM notified_changes WHERE changed_at < ?", (cutoff,))
+
+    def _write(self, conn: sqlite3.Connection, upserts: dict, deletes: dict) -> range:
+        """
+        Değişiklikleri yazar ve notified_changes'ta bu yazmanın aldığı sıra numaralarını döner.
+        """
+        # IMMEDIATE: yazma kilidi baştan alınır, diğer süreç yazıyorsa busy timeout kadar beklenir;
+        # böylece sıra numaraları commit sırasıyla aynı ve ardışık artar
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if deletes:
+                # Silmeden sonra başka süreçte yapılmış bildirim korunur
+                conn.executemany(
+                    "DELETE FROM notified_prices WHERE product_link = ? AND notified_at <= ?",
+                    deletes.items()
+                )
+                conn.executemany(
+                    "INSERT INTO notified_changes (product_link, price, changed_at) VALUES (?, NULL, ?)",
+                    deletes.items()
+                )
+            if upserts:
+                conn.executemany("""
+                    INSERT INTO notified_prices (product_link, price, notified_at) VALUES (?, ?, ?)
+                    ON CONFLICT (product_link) DO UPDATE SET
+                        price = excluded.price, notified_at = excluded.notified_at
+                    WHERE excluded.notified_at >= notified_prices.notified_at
+                """, [(link, price, at) for link, (price, at) in upserts.items()])
+                conn.executemany(
+                    "INSERT INTO notified_changes (product_link, price, changed_at) VALUES (?, ?, ?)",
+                    [(link, price, at) for link, (price, at) in upserts.items()]
+                )
+            last = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+            self._prune(conn)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return range(last - len(upserts) - len(deletes) + 1, last + 1)
+
+    async def flush_async(self):
+        """
+        Bekleyen değişiklik varsa ya da senkron aralığı dolduysa flush'ı thread'de çalıştırır.
+        """
+        if not self._loaded:
+            return
+        if self.pending or time.monotonic() - self._last_flush >= self.sync_interval:
+            await asyncio.to_thread(self.flush)
+
+    def close(self):
+        if self._loaded:
+            self.flush()
+        with self._db_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+notified_prices = NotifiedPriceStore()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+# price_history.py
+
+from datetime import datetime
+
+from logconfig import logger, flush_logs
+from utilities import extract_product_id
+
+
+def price_to_kurus(price) -> int:
+    """
+    TL fiyatını tam sayı kuruşa çevirir (1234.5 -> 123450).
+    """
+    return int(round(float(price) * 100))
+
+
+def kurus_to_price(kurus) -> float | None:
+    return kurus / 100 if kurus is not None else None
+
+
+async def create_price_history_table(pool):
+    """
+    Yalnızca fiyat geçişlerini tutan, append-only price_history tablosunu oluşturur.
+    (product_id, recorded_at) birincil anahtarı sayesinde ürün + zaman aralığı
+    sorguları tabloyu taramadan index üzerinden cevaplanır.
+    """
+    try:
+        async with pool.acquire() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute("""
+                    CREATE TABLE IF NOT EXISTS price_history (
+                        product_id INT UNSIGNED NOT NULL,
+                        recorded_at DATETIME NOT NULL,
+                        price_kurus INT UNSIGNED NOT NULL,
+                        PRIMARY KEY (product_id, recorded_at),
+                        INDEX idx_recorded_at (recorded_at)
+                    ) ENGINE=InnoDB
+                """)
+                await conn.commit()
+        logger.info("create_price_history_table: 'price_history' table ready.")
+        flush_logs()
+    except Exception as e:
+        logger.error("create_price_history_table: Error occurred: %s", e)
+        flush_logs()
+
+
+async def record_price_transitions(cur, items):
+    """
+    db_bulk_worker'ın yazdığı insert/update kayıtlarını (yani fiyat geçişlerini)
+    aynı transaction içinde price_history'ye ekler. Commit çağıran tarafa aittir.
+    """
+    data = []
+    for item in items:
+        # Yalnızca görseli değişen ürün fiyat geçişi değildir
+        if item.get('image_only'):
+            continue
+        product_id = item.get('product_id') or extract_product_id(item['product_link'])
+        # Ayrıştırılamayan fiyat (0.0) bir geçiş sayılmaz
+        if product_id is None or not item['product_price']:
+            continue
+        data.append((product_id, item['now'], price_to_kurus(item['product_price'])))
+    if not data:
+        return
+    await cur.executemany("""
+        INSERT INTO price_history (product_id, recorded_at, price_kurus)
+        VALUES (%s, %s, %s) AS new
+        ON DUPLICATE KEY UPDATE price_kurus = new.price_kurus
+    """, data)
+
+
+async def get_price_stats(pool, product_id: int, since: datetime, until: datetime = None) -> dict:
+    """
+    [since, until) aralığında ürünün min/max/son fiyatını döner.
+    Aralık başında geçerli olan fiyat (since öncesindeki son geçiş) da hesaba katılır.
+    Fiyatlar TL cinsindendir; hiç kayıt yoksa değerler None olur.
+    """
+    until = until or datetime.now()
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute("""
+                SELECT MIN(price_kurus), MAX(price_kurus), COUNT(*)
+                FROM price_history
+                WHERE product_id = %s AND recorded_at >= %s AND recorded_at < %s
+            """, (product_id, since, until))
+            lo, hi, transitions = await cur.fetchone()
+            await cur.execute("""
+                SELECT price_kurus FROM price_history
+                WHERE product_id = %s AND recorded_at < %s
+                ORDER BY recorded_at DESC
+                LIMIT 1
+            """, (product_id, until))
+            last_row = await cur.fetchone()
+            await cur.execute("""
+                SELECT price_kurus FROM price_history
+                WHERE product_id = %s AND recorded_at < %s
+                ORDER BY recorded_at DESC
+                LIMIT 1
+            """, (product_id, since))
+            start_row = await cur.fetchone()
+
+    candidates = [v for v in (lo, hi, start_row[0] if start_row else None) if v is not None]
+    return {
+        "min": kurus_to_price(min(candidates)) if candidates else None,
+        "max": kurus_to_price(max(candidates)) if candidates else None,
+        "last": kurus_to_price(last_row[0]) if last_row else None,
+        "transitions": transitions,
+    }
+
+
+async def get_last_prices(pool, product_id: int, n: int = 10) -> list[tuple[datetime, float]]:
+    """
+    Ürünün en son n fiyat geçişini yeniden eskiye (recorded_at, fiyat) olarak döner.
+    """
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute("""
+                SELECT recorded_at, price_kurus FROM price_history
+                WHERE product_id = %s
+                ORDER BY recorded_at DESC
+                LIMIT %s
+            """, (product_id, n))
+            rows = await cur.fetchall()
+    return [(recorded_at, kurus_to_price(kurus)) for recorded_at, kurus in rows]
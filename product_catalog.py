@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# product_catalog.py
+
+import os
+import json
+import time
+
+from logconfig import logger, flush_logs
+
+PRODUCT_CATALOG_FILE = os.getenv(
+    "PRODUCT_CATALOG_FILE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "product_catalog.json")
+)
+PRODUCT_CATALOG_CHECK_INTERVAL = float(os.getenv("PRODUCT_CATALOG_CHECK_INTERVAL", "5"))
+
+
+class ProductCatalog:
+    """
+    MediaMarkt ürün ID'si -> Akakçe adı kataloğu.
+    Dosya marka bazında gruplanır ({"xiaomi": {"1240637": "..."}, ...}), yüklenirken
+    tek bir ID indeksine düzleştirilir. Dosyanın mtime'ı en fazla check_interval
+    saniyede bir kontrol edilir; değiştiyse scrape döngüsü durmadan yeniden yüklenir.
+    Bozuk dosyada önceki katalog korunur.
+    """
+
+    def __init__(self, path: str = PRODUCT_CATALOG_FILE, check_interval: float = PRODUCT_CATALOG_CHECK_INTERVAL):
+        self.path = path
+        self.check_interval = check_interval
+        self._by_id = {}
+        self._by_brand = {}
+        self._mtime = None
+        self._next_check = 0.0
+        self.version = 0
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + self.check_interval
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            if self._mtime != -1:
+                logger.warning("ProductCatalog: Katalog dosyası bulunamadı: %s", self.path)
+                flush_logs()
+                self._mtime = -1
+            return
+        if mtime != self._mtime:
+            self.reload(mtime)
+
+    def reload(self, mtime: float = None):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            by_id = {}
+            by_brand = {}
+            for brand, entries in data.items():
+                brand = brand.lower()
+                by_brand[brand] = {str(pid): name for pid, name in entries.items()}
+                for pid, name in by_brand[brand].items():
+                    if pid in by_id:
+                        if by_id[pid] != name:
+                            logger.warning("ProductCatalog: ID %s birden fazla markada tanımlı, ilk kayıt kullanılıyor.", pid)
+                        continue
+                    by_id[pid] = name
+        except Exception as e:
+            logger.error("ProductCatalog: Katalog yüklenemedi, önceki katalog korunuyor: %s", e)
+            flush_logs()
+            self._mtime = mtime
+            return
+        self._by_id = by_id
+        self._by_brand = by_brand
+        self._mtime = mtime if mtime is not None else os.path.getmtime(self.path)
+        self.version += 1
+        logger.info("ProductCatalog: %d ürün yüklendi (%d marka).", len(by_id), len(by_brand))
+        flush_logs()
+
+    def get(self, product_id, brand: str = None) -> str | None:
+        """
+        ID'nin Akakçe adını döner; brand verilirse yalnızca o markanın kayıtlarına bakar.
+        """
+        self._maybe_reload()
+        if brand is None:
+            return self._by_id.get(str(product_id))
+        return self._by_brand.get(brand, {}).get(str(product_id))
+
+    def __len__(self) -> int:
+        self._maybe_reload()
+        return len(self._by_id)
+
+
+product_catalog = ProductCatalog()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# product_snapshot.py
+
+import time
+import aiomysql
+
+from config import PRODUCTS_TABLE
+from logconfig import logger, flush_logs
+
+SNAPSHOT_FETCH_SIZE = 1000
+
+
+class ProductSnapshot:
+    """
+    products tablosunun bellekteki kopyası: product_link -> (product_price, product_name, image_url).
+    Açılışta bir kez streaming cursor ile yüklenir, sonra db_bulk_worker
+    commit ettiği batch'lerle güncel tutar.
+    """
+
+    def __init__(self):
+        self._rows = {}
+        # Son drain_changed() çağrısından beri eklenen, adı veya görseli değişen linkler
+        self._changed = set()
+        # Var olan kayıtlardan adı değişenler (görsel de değişmiş olabilir)
+        self._renamed = set()
+        self.loaded = False
+
+    async def load(self, pool):
+        t0 = time.time()
+        rows = {}
+        async with pool.acquire() as conn:
+            async with conn.cursor(aiomysql.SSCursor) as cur:
+                await cur.execute(f"SELECT product_link, product_price, product_name, image_url FROM {PRODUCTS_TABLE}")
+                while True:
+                    chunk = await cur.fetchmany(SNAPSHOT_FETCH_SIZE)
+                    if not chunk:
+                        break
+                    for link, price, name, image_url in chunk:
+                        if link:
+                            rows[link] = (float(price) if price is not None else None, name, image_url)
+        self._rows = rows
+        self.loaded = True
+        logger.info("ProductSnapshot.load: %d ürün yüklendi (%.2f sn).", len(rows), time.time() - t0)
+        flush_logs()
+
+    async def ensure_loaded(self, pool):
+        if not self.loaded:
+            await self.load(pool)
+
+    def get(self, product_link: str):
+        """
+        (product_price, product_name, image_url) veya kayıt yoksa None döner.
+        """
+        return self._rows.get(product_link)
+
+    def image_url(self, product_link: str) -> str | None:
+        row = self._rows.get(product_link)
+        return row[2] if row else None
+
+    def __contains__(self, product_link: str) -> bool:
+        return product_link in self._rows
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def links(self):
+        return self._rows.keys()
+
+    def apply(self, items):
+        """
+        DB'ye commit edilmiş bir batch'i snapshot'a uygular.
+        """
+        for item in items:
+            link = item['product_link']
+            current = self._rows.get(link)
+            name = item.get('product_name') or (current[1] if current else None)
+            image_url = item.get('image_url') or (current[2] if current else None)
+            if current is None or current[1] != name or current[2] != image_url:
+                self._changed.add(link)
+            if current is not None and current[1] != name:
+                self._renamed.add(link)
+            self._rows[link] = (item['product_price'], name, image_url)
+
+    def drain_changed(self) -> set:
+        """
+        Son çağrıdan beri eklenen, adı veya görseli değişen linkleri döner ve listeyi sıfırlar.
+        """
+        changed, self._changed = self._changed, set()
+        return changed
+
+    def drain_renamed(self) -> set:
+        """
+        Son çağrıdan beri adı değişen (önceden var olan) linkleri döner ve listeyi sıfırlar.
+        """
+        renamed, self._renamed = self._renamed, set()
+        return renamed
+
+
+product_snapshot = ProductSnapshot()
@@ -1,8 +1,13 @@
 # telegram_notifier.py
 import os
-import itertools
+import json
+import time
+import random
+import asyncio
+import threading
 import httpx
 from logconfig import logger, flush_logs
+from metrics import metrics
 
 # .env'den Telegram token ve chat id bilgilerini alıyoruz
 TELEGRAM_TOKEN_1 = os.getenv("TELEGRAM_TOKEN_1")
@@ -10,39 +15,461 @@ TELEGRAM_TOKEN_2 = os.getenv("TELEGRAM_TOKEN_2")
 TELEGRAM_TOKEN_3 = os.getenv("TELEGRAM_TOKEN_3")
 TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
 
-# Token listesini oluştur ve döngüsel olarak geçiş sağlayacak yapı kur
 TELEGRAM_TOKENS = [token for token in (TELEGRAM_TOKEN_1, TELEGRAM_TOKEN_2, TELEGRAM_TOKEN_3) if token]
-TELEGRAM_TOKEN_CYCLE = itertools.cycle(TELEGRAM_TOKENS)
 
-async def send_telegram_notification(message: str, image_path: str = None):
+# Token başına saniyedeki mesaj ve anlık patlama sınırı (Telegram aynı sohbete ~1 mesaj/sn önerir)
+TELEGRAM_RATE = float(os.getenv("TELEGRAM_RATE", "1"))
+TELEGRAM_BURST = int(os.getenv("TELEGRAM_BURST", "3"))
+TELEGRAM_CONCURRENCY = int(os.getenv("TELEGRAM_CONCURRENCY", "4"))
+TELEGRAM_MAX_RETRIES = int(os.getenv("TELEGRAM_MAX_RETRIES", "5"))
+TELEGRAM_TIMEOUT = float(os.getenv("TELEGRAM_TIMEOUT", "10"))
+# Kapanışta bekleyen bildirimler için en fazla beklenecek süre
+TELEGRAM_DRAIN_TIMEOUT = float(os.getenv("TELEGRAM_DRAIN_TIMEOUT", "30"))
+TELEGRAM_API_URL = "https://api.telegram.org"
+# Telegram Bot API sınırları
+TELEGRAM_MESSAGE_MAX = 4096
+TELEGRAM_CAPTION_MAX = 1024
+TELEGRAM_MEDIA_GROUP_MAX = 10
+# Gönderilen görsellerin Telegram file_id'leri (bot + cache dosyası başına)
+TELEGRAM_FILE_ID_STORE = os.getenv("TELEGRAM_FILE_ID_STORE", "telegram_file_ids.json")
+
+
+class TokenBucket:
+    """
+    rate/sn dolan, en fazla capacity jeton tutan kova. 429 geldiğinde pause()
+    ile retry_after süresi boyunca hiç jeton verilmez.
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def ready_in(self, n: int = 1) -> float:
+        """
+        n jetonun kaç saniye sonra hazır olacağı.
+        """
+        now = time.monotonic()
+        self._refill(now)
+        wait = max(0.0, self.blocked_until - now)
+        if self.tokens < n:
+            wait = max(wait, (n - self.tokens) / self.rate)
+        return wait
+
+    async def acquire(self, n: int = 1):
+        """
+        n jeton alır (ör. albümdeki görsel sayısı). Kapasiteden büyük n, kapasiteyi
+        aşmayan parçalar halinde alınır; böylece her görsel hız sınırına sayılır.
+        """
+        while n > 0:
+            chunk = min(n, self.capacity)
+            wait = self.ready_in(chunk)
+            if wait <= 0:
+                self.tokens -= chunk
+                n -= chunk
+            else:
+                await asyncio.sleep(wait)
+
+    def pause(self, seconds: float):
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.tokens = 0.0
+
+
+class FileIdStore:
     """
-    Telegram kanalına mesaj gönderimi için asenkron fonksiyon.
-    Eğer image_path belirtilmiş ve dosya mevcutsa, sendPhoto API'si kullanılarak ürün resmiyle beraber gönderilir;
-    aksi durumda sendMessage ile sadece metin gönderilir.
+    Telegram'ın yüklenen fotoğraf için döndürdüğü file_id'yi bot ID'si ve cache dosyası
+    başına saklar; aynı görsel tekrar gönderilirken dosya yerine bu referans kullanılır.
+    file_id bota özgü olduğundan anahtar token'ın ':' öncesi (bot ID) kısmıdır.
+    Dosya boyutu değiştiyse (görsel yeniden indirildi) kayıt geçersiz sayılır; cache'ten
+    silinen veya üzerine yazılan dosyaların kayıtları forget() ile atılır.
+    Değişiklikler bellekte birikir, save() ile toplu yazılır.
     """
-    token = next(TELEGRAM_TOKEN_CYCLE)
-    base_url = f"https://api.telegram.org/bot{token}/"
-    async with httpx.AsyncClient(timeout=10) as client:
-        if image_path and os.path.exists(image_path):
-            url = base_url + "sendPhoto"
-            # Dosyayı baytlara çevirerek multipart olarak gönderiyoruz.
+
+    def __init__(self, path: str = TELEGRAM_FILE_ID_STORE):
+        self.path = path
+        self._data = None
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._data is not None:
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self._data = json.load(f)
+        except FileNotFoundError:
+            self._data = {}
+        except Exception as e:
+            logger.warning("FileIdStore: %s okunamadı, boş başlanıyor: %s", self.path, e)
+            self._data = {}
+
+    def get(self, bot_id: str, image_path: str, size: int) -> str | None:
+        with self._lock:
+            self._load()
+            entry = self._data.get(bot_id, {}).get(image_path)
+            if entry and entry["size"] == size:
+                return entry["file_id"]
+            return None
+
+    def put(self, bot_id: str, image_path: str, size: int, file_id: str):
+        with self._lock:
+            self._load()
+            self._data.setdefault(bot_id, {})[image_path] = {"file_id": file_id, "size": size}
+            self._dirty = True
+
+    def discard(self, bot_id: str, image_path: str):
+        with self._lock:
+            self._load()
+            if self._data.get(bot_id, {}).pop(image_path, None) is not None:
+                self._dirty = True
+
+    def forget(self, image_paths):
+        """
+        Cache'ten silinen/üzerine yazılan dosyaların tüm botlardaki kayıtlarını atar
+        (ThumbnailCache dinleyicisi; thread'den çağrılabilir).
+        """
+        with self._lock:
+            self._load()
+            for entries in self._data.values():
+                for path in image_paths:
+                    if entries.pop(path, None) is not None:
+                        self._dirty = True
+
+    def save(self):
+        """
+        Değişiklik varsa atomik yazar (thread'de çağrılmalıdır).
+        """
+        with self._lock:
+            if not self._dirty:
+                return
             try:
-                with open(image_path, "rb") as f:
-                    files = {"photo": f}
-                    data = {"chat_id": TELEGRAM_CHAT_ID, "caption": message}
-                    response = await client.post(url, data=data, files=files)
-                    logger.info("Telegram sendPhoto response: %s", response.text)
-                    flush_logs()
-            except Exception as e:
-                logger.error("Telegram sendPhoto error: %s", e)
+                tmp = self.path + ".tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump(self._data, f, ensure_ascii=False)
+                os.replace(tmp, self.path)
+                self._dirty = False
+            except OSError as e:
+                logger.warning("FileIdStore: %s yazılamadı: %s", self.path, e)
                 flush_logs()
-        else:
-            url = base_url + "sendMessage"
-            data = {"chat_id": TELEGRAM_CHAT_ID, "text": message}
+
+
+class TelegramDeliveryService:
+    """
+    Telegram bildirimlerini tek, keep-alive bir httpx istemcisiyle gönderir.
+    Her bot token'ının kendi jeton kovası vardır; mesaj o an en erken hazır olan token'dan çıkar.
+    429'da retry_after kadar o token durdurulur, ağ/5xx hatalarında üstel bekleme ile
+    yeniden denenir. Eşzamanlı istek sayısı semaforla sınırlıdır.
+    Arka planda başlatılan gönderimler track() ile izlenir; close() bitmelerini bekler.
+    Bir görsel bir bot ile bir kez yüklendikten sonra file_id ile referans olarak gönderilir.
+    """
+
+    def __init__(
+        self,
+        tokens: list[str] = TELEGRAM_TOKENS,
+        chat_id: str = TELEGRAM_CHAT_ID,
+        rate: float = TELEGRAM_RATE,
+        burst: int = TELEGRAM_BURST,
+        concurrency: int = TELEGRAM_CONCURRENCY,
+        max_retries: int = TELEGRAM_MAX_RETRIES,
+        timeout: float = TELEGRAM_TIMEOUT,
+        file_ids: FileIdStore = None
+    ):
+        self.tokens = list(tokens)
+        self.chat_id = chat_id
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self._buckets = {token: TokenBucket(rate, burst) for token in self.tokens}
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._client = None
+        self._tasks = set()
+        self.file_ids = file_ids or FileIdStore()
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.concurrency,
+                    max_keepalive_connections=self.concurrency
+                )
+            )
+        return self._client
+
+    def _pick_token(self) -> str:
+        return min(self.tokens, key=lambda token: self._buckets[token].ready_in())
+
+    async def _post(self, token: str, message: str, photo: bytes | str | None) -> httpx.Response:
+        """
+        photo: yüklenecek baytlar, daha önce yüklenmiş görselin file_id'si veya None (yalnızca metin).
+        Görsel açıklaması Telegram sınırına kırpılır; uzun açıklama 400 ile reddedilirdi.
+        """
+        base_url = f"{TELEGRAM_API_URL}/bot{token}/"
+        caption = message[:TELEGRAM_CAPTION_MAX]
+        async with self._semaphore:
+            if isinstance(photo, str):
+                return await self._get_client().post(
+                    base_url + "sendPhoto",
+                    data={"chat_id": self.chat_id, "caption": caption, "photo": photo}
+                )
+            if photo is not None:
+                return await self._get_client().post(
+                    base_url + "sendPhoto",
+                    data={"chat_id": self.chat_id, "caption": caption},
+                    files={"photo": ("photo.jpg", photo)}
+                )
+            return await self._get_client().post(
+                base_url + "sendMessage",
+                data={"chat_id": self.chat_id, "text": message}
+            )
+
+    @staticmethod
+    def _retry_after(response: httpx.Response) -> float:
+        try:
+            return float(response.json()["parameters"]["retry_after"])
+        except Exception:
+            return float(response.headers.get("Retry-After", "1"))
+
+    async def send(self, message: str, image_path: str = None) -> bool:
+        """
+        Eğer image_path belirtilmiş ve dosya mevcutsa sendPhoto, aksi durumda sendMessage kullanılır.
+        Gönderilemezse (tüm denemeler bitti veya kalıcı hata) False döner.
+        """
+        if not self.tokens:
+            logger.warning("TelegramDeliveryService: TELEGRAM_TOKEN_* tanımlı değil, bildirim atlandı.")
+            flush_logs()
+            return False
+        try:
+            size = os.path.getsize(image_path) if image_path else None
+        except OSError:
+            size = None
+        # Dosya baytları yalnızca file_id bilinmeyen bir bot ile yükleme gerekirse okunur
+        data = None
+
+        with metrics.timer("notification_send"):
+            for attempt in range(1, self.max_retries + 1):
+                token = self._pick_token()
+                bucket = self._buckets[token]
+                bot_id = token.split(":", 1)[0]
+                photo = file_id = None
+                if size is not None:
+                    file_id = self.file_ids.get(bot_id, image_path, size)
+                    if file_id is None and data is None:
+                        try:
+                            data = await asyncio.to_thread(_read_file, image_path)
+                        except OSError as e:
+                            logger.warning("TelegramDeliveryService: Görsel okunamadı, metin gönderilecek: %s", e)
+                            size = None
+                    photo = file_id or data
+                method = "sendPhoto" if photo is not None else "sendMessage"
+                await bucket.acquire()
+                try:
+                    response = await self._post(token, message, photo)
+                except httpx.HTTPError as e:
+                    logger.warning("TelegramDeliveryService: %s ağ hatası (deneme %d): %s", method, attempt, e)
+                    await asyncio.sleep(self._backoff(attempt))
+                    continue
+                if response.status_code == 200:
+                    if file_id is not None:
+                        metrics.inc("notification_photo_reused")
+                    elif photo is not None:
+                        self._remember_file_id(bot_id, image_path, size, response)
+                    logger.info("TelegramDeliveryService: %s gönderildi.", method)
+                    flush_logs()
+                    return True
+                if await self._should_retry(response, bucket, attempt, method):
+                    continue
+                if file_id is not None:
+                    # Referans geçersiz (ör. bot değişti); bir sonraki denemede dosya yüklenir
+                    logger.warning("TelegramDeliveryService: file_id reddedildi, görsel yüklenecek: %s", response.text)
+                    self.file_ids.discard(bot_id, image_path)
+                    continue
+                logger.error("TelegramDeliveryService: %s reddedildi: %s", method, response.text)
+                if photo is None:
+                    break
+                # Görsel kabul edilmediyse (ör. bozuk dosya) metin olarak dene
+                size = None
+        logger.error("TelegramDeliveryService: Bildirim gönderilemedi: %s", message[:80])
+        flush_logs()
+        metrics.inc("notification_errors")
+        return False
+
+    async def send_media_group(self, items: list[tuple[str, str]]) -> bool:
+        """
+        2-10 görseli (caption, image_path) tek albüm olarak sendMediaGroup ile gönderir.
+        Bot için file_id'si bilinen görseller referansla, diğerleri yüklenerek gönderilir.
+        """
+        if not self.tokens:
+            logger.warning("TelegramDeliveryService: TELEGRAM_TOKEN_* tanımlı değil, bildirim atlandı.")
+            flush_logs()
+            return False
+        try:
+            sizes = [os.path.getsize(path) for _, path in items]
+        except OSError as e:
+            logger.warning("TelegramDeliveryService: Albüm görseli bulunamadı: %s", e)
+            return False
+        blobs = {}
+
+        with metrics.timer("notification_send"):
+            for attempt in range(1, self.max_retries + 1):
+                token = self._pick_token()
+                bucket = self._buckets[token]
+                bot_id = token.split(":", 1)[0]
+                media, files, reused = [], {}, []
+                for i, ((caption, path), size) in enumerate(zip(items, sizes)):
+                    file_id = self.file_ids.get(bot_id, path, size)
+                    if file_id is None:
+                        if i not in blobs:
+                            try:
+                                blobs[i] = await asyncio.to_thread(_read_file, path)
+                            except OSError as e:
+                                logger.warning("TelegramDeliveryService: Albüm görseli okunamadı: %s", e)
+                                return False
+                        files[f"photo{i}"] = (f"photo{i}.jpg", blobs[i])
+                        file_id = f"attach://photo{i}"
+                    else:
+                        reused.append(i)
+                    media.append({"type": "photo", "media": file_id, "caption": caption[:TELEGRAM_CAPTION_MAX]})
+                await bucket.acquire(len(items))
+                try:
+                    async with self._semaphore:
+                        response = await self._get_client().post(
+                            f"{TELEGRAM_API_URL}/bot{token}/sendMediaGroup",
+                            data={"chat_id": self.chat_id, "media": json.dumps(media, ensure_ascii=False)},
+                            files=files or None
+                        )
+                except httpx.HTTPError as e:
+                    logger.warning("TelegramDeliveryService: sendMediaGroup ağ hatası (deneme %d): %s", attempt, e)
+                    await asyncio.sleep(self._backoff(attempt))
+                    continue
+                if response.status_code == 200:
+                    if reused:
+                        metrics.inc("notification_photo_reused", len(reused))
+                    try:
+                        messages = response.json()["result"]
+                    except Exception:
+                        messages = []
+                    self._remember_file_ids(bot_id, [
+                        (items[i][1], sizes[i], messages[i]) for i in range(len(items))
+                        if i not in reused and i < len(messages)
+                    ])
+                    logger.info("TelegramDeliveryService: sendMediaGroup (%d görsel) gönderildi.", len(items))
+                    flush_logs()
+                    return True
+                if await self._should_retry(response, bucket, attempt, "sendMediaGroup"):
+                    continue
+                if reused:
+                    logger.warning("TelegramDeliveryService: Albümde file_id reddedildi, görseller yüklenecek: %s", response.text)
+                    for i in reused:
+                        self.file_ids.discard(bot_id, items[i][1])
+                    continue
+                logger.error("TelegramDeliveryService: sendMediaGroup reddedildi: %s", response.text)
+                break
+        logger.error("TelegramDeliveryService: Albüm gönderilemedi (%d görsel).", len(items))
+        flush_logs()
+        metrics.inc("notification_errors")
+        return False
+
+    async def _should_retry(self, response: httpx.Response, bucket: TokenBucket, attempt: int, method: str) -> bool:
+        """
+        429'da token'ı retry_after kadar durdurur, 5xx'te bekler; yeniden denenecekse True döner.
+        """
+        if response.status_code == 429:
+            retry_after = self._retry_after(response)
+            logger.warning("TelegramDeliveryService: 429, token %s sn bekletiliyor.", retry_after)
+            metrics.inc("notification_rate_limited")
+            bucket.pause(retry_after)
+            return True
+        if response.status_code >= 500:
+            logger.warning("TelegramDeliveryService: %s HTTP %s (deneme %d)", method, response.status_code, attempt)
+            await asyncio.sleep(self._backoff(attempt))
+            return True
+        return False
+
+    def _remember_file_id(self, bot_id: str, image_path: str, size: int, response: httpx.Response):
+        """
+        sendPhoto cevabındaki görselin file_id'sini saklar.
+        """
+        try:
+            message = response.json()["result"]
+        except Exception as e:
+            logger.debug("TelegramDeliveryService: file_id okunamadı: %s", e)
+            return
+        self._remember_file_ids(bot_id, [(image_path, size, message)])
+
+    def _remember_file_ids(self, bot_id: str, sent: list[tuple[str, int, dict]]):
+        """
+        Gönderilen mesajlardaki en büyük fotoğraf boyutunun file_id'sini (image_path, size) için saklar.
+        """
+        for image_path, size, message in sent:
             try:
-                response = await client.post(url, data=data)
-                logger.info("Telegram sendMessage response: %s", response.text)
-                flush_logs()
-            except Exception as e:
-                logger.error("Telegram sendMessage error: %s", e)
-                flush_logs()
+                file_id = message["photo"][-1]["file_id"]
+            except (KeyError, IndexError, TypeError):
+                continue
+            self.file_ids.put(bot_id, image_path, size, file_id)
+
+    @staticmethod
+    def _backoff(attempt: int) -> float:
+        return min(30.0, 0.5 * 2 ** (attempt - 1)) * random.uniform(0.8, 1.2)
+
+    def track(self, coro) -> asyncio.Task:
+        """
+        Arka planda çalışacak bir bildirim coroutine'ini başlatır ve referansını tutar.
+        """
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._task_done)
+        return task
+
+    def _task_done(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("TelegramDeliveryService: Bildirim görevi hata verdi: %s", task.exception())
+            flush_logs()
+            metrics.inc("notification_errors")
+
+    def submit(self, message: str, image_path: str = None) -> asyncio.Task:
+        return self.track(self.send(message, image_path))
+
+    @property
+    def pending(self) -> int:
+        return len(self._tasks)
+
+    async def close(self, timeout: float = TELEGRAM_DRAIN_TIMEOUT):
+        """
+        Bekleyen bildirimlerin bitmesini timeout kadar bekler, kalanları iptal eder ve istemciyi kapatır.
+        """
+        if self._tasks:
+            logger.info("TelegramDeliveryService: %d bekleyen bildirim bekleniyor...", len(self._tasks))
+            flush_logs()
+            _, not_done = await asyncio.wait(set(self._tasks), timeout=timeout)
+            for task in not_done:
+                task.cancel()
+            if not_done:
+                logger.warning("TelegramDeliveryService: %d bildirim zaman aşımıyla iptal edildi.", len(not_done))
+                await asyncio.gather(*not_done, return_exceptions=True)
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        await asyncio.to_thread(self.file_ids.save)
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+telegram_service = TelegramDeliveryService()
+
+
+async def send_telegram_notification(message: str, image_path: str = None) -> bool:
+    """
+    Telegram kanalına mesaj gönderimi için asenkron fonksiyon (telegram_service.send).
+    """
+    return await telegram_service.send(message, image_path)
@@ -0,0 +1,268 @@
+#!/usr/bin/env python
+# thumbnail_cache.py
+
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from PIL import Image
+
+from logconfig import logger, flush_logs
+
+CACHE_DIR = os.getenv("THUMBNAIL_CACHE_DIR", "cache_previews")
+# "JPEG" veya "WEBP"
+THUMBNAIL_FORMAT = os.getenv("THUMBNAIL_FORMAT", "JPEG").strip().upper()
+THUMBNAIL_MAX_SIZE = int(os.getenv("THUMBNAIL_MAX_SIZE", "640"))
+THUMBNAIL_QUALITY = int(os.getenv("THUMBNAIL_QUALITY", "80"))
+THUMBNAIL_CACHE_MAX_MB = float(os.getenv("THUMBNAIL_CACHE_MAX_MB", "200"))
+# Link -> dosya indeksi; yoksa ilk kullanımda dizin taranır
+THUMBNAIL_MANIFEST_FILE = os.getenv("THUMBNAIL_MANIFEST_FILE", os.path.join(CACHE_DIR, "manifest.json"))
+
+THUMBNAIL_EXTENSIONS = {"JPEG": ".jpg", "WEBP": ".webp"}
+
+
+class ThumbnailCache:
+    """
+    Ürün önizlemelerini küçültülmüş JPEG/WebP olarak cache_previews/<ilk 2 hex>/<md5>.<ext>
+    yapısında saklar. Toplam boyut max_bytes'ı aşınca en uzun süredir kullanılmayan
+    dosyalar silinir.
+    İndeks (dosya -> boyut, link, kaynak görsel URL'si) kullanım sırasıyla manifest dosyasına
+    yazılır ve açılışta oradan yüklenir; böylece "bu link cache'te mi, aynı görselden mi?"
+    sorusu disk erişimi olmadan cevaplanır.
+    Manifest yoksa dizin taranır ve sıra dosya mtime'ından kurulur.
+    Ekleme/silme thread'lerden çağrılabilir. Silinen veya üzerine yazılan dosyalar
+    add_remove_listener() ile kaydedilen dinleyicilere bildirilir.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str = CACHE_DIR,
+        image_format: str = THUMBNAIL_FORMAT,
+        max_size: int = THUMBNAIL_MAX_SIZE,
+        quality: int = THUMBNAIL_QUALITY,
+        max_bytes: int = int(THUMBNAIL_CACHE_MAX_MB * 1024 * 1024),
+        manifest_file: str = THUMBNAIL_MANIFEST_FILE
+    ):
+        self.cache_dir = cache_dir
+        self.image_format = image_format if image_format in THUMBNAIL_EXTENSIONS else "JPEG"
+        self.extension = THUMBNAIL_EXTENSIONS[self.image_format]
+        self.max_size = max_size
+        self.quality = quality
+        self.max_bytes = max_bytes
+        self.manifest_file = manifest_file
+        # path -> (size, link, source); baştaki en uzun süredir kullanılmayan
+        self._entries = OrderedDict()
+        self._links = {}
+        # Görseli yeniden indirilmesi gereken linkler (ör. ürün adı değişti, kaynak bilinmiyor)
+        self._stale = set()
+        self._total = 0
+        self._indexed = False
+        self._dirty = False
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def path_for(self, url: str) -> str:
+        key = hashlib.md5(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, key[:2], key + self.extension)
+
+    def _add(self, path: str, size: int, link: str | None, source: str | None = None):
+        old = self._entries.pop(path, None)
+        if old is not None:
+            self._total -= old[0]
+        self._entries[path] = (size, link, source)
+        self._total += size
+        if link:
+            self._links[link] = path
+
+    def _load_manifest(self) -> bool:
+        try:
+            with open(self.manifest_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            # Sürüm 1 kayıtlarında kaynak URL yok
+            for path, size, link, *source in data["entries"]:
+                self._add(path, size, link, source[0] if source else None)
+            self._stale = set(data.get("stale", ())) & self._links.keys()
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            logger.warning("ThumbnailCache: Manifest okunamadı, dizin taranacak: %s", e)
+            self._entries.clear()
+            self._links.clear()
+            self._stale.clear()
+            self._total = 0
+            return False
+        return True
+
+    def _ensure_index(self):
+        if self._indexed:
+            return
+        if self._load_manifest():
+            self._indexed = True
+            logger.info("ThumbnailCache: Manifest'ten %d dosya, %.1f MB yüklendi.", len(self._entries), self._total / (1024 * 1024))
+            flush_logs()
+            return
+        found = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith((".tmp", ".json")):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                found.append((st.st_mtime, path, st.st_size))
+        # Eski sürümün düz PNG dosyaları da dahil; en eski oldukları için ilk onlar silinir
+        found.sort()
+        # Link bilgisi yalnızca manifest'te var; taranan dosyalar linksiz indekslenir
+        for _, path, size in found:
+            self._add(path, size, None)
+        self._indexed = True
+        self._dirty = True
+        logger.info("ThumbnailCache: %d dosya, %.1f MB indekslendi.", len(found), self._total / (1024 * 1024))
+        flush_logs()
+
+    def add_remove_listener(self, callback):
+        """
+        callback(paths) silinen veya üzerine yazılan dosya yollarıyla, kilit dışında çağrılır.
+        """
+        self._listeners.append(callback)
+
+    def _notify_removed(self, paths: list[str]):
+        if not paths:
+            return
+        for callback in self._listeners:
+            try:
+                callback(paths)
+            except Exception as e:
+                logger.warning("ThumbnailCache: Silme dinleyicisi hata verdi: %s", e)
+
+    def _evict(self) -> list[str]:
+        evicted = []
+        removed = 0
+        # En son yazılan dosya (sondaki kayıt) bütçeden büyük olsa da tutulur
+        while self._total > self.max_bytes and len(self._entries) > 1:
+            path, (size, link, _) = self._entries.popitem(last=False)
+            evicted.append(path)
+            self._total -= size
+            if link and self._links.get(link) == path:
+                del self._links[link]
+                self._stale.discard(link)
+            self._dirty = True
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning("ThumbnailCache: Silinemedi: %s (%s)", path, e)
+        if removed:
+            logger.info("ThumbnailCache: %d dosya silindi, toplam %.1f MB.", removed, self._total / (1024 * 1024))
+        return evicted
+
+    def load(self):
+        """
+        İndeksi hazırlar; açılışta thread'de çağrılırsa ilk has() event loop'u bloklamaz.
+        """
+        with self._lock:
+            self._ensure_index()
+
+    def has(self, link: str, source: str = None) -> bool:
+        """
+        Link cache'te mi? source verilirse cache'teki görselin aynı URL'den indirilmiş
+        olması da gerekir; farklıysa (görsel değişmiş) False döner ve yeniden indirilir.
+        """
+        with self._lock:
+            self._ensure_index()
+            path = self._links.get(link)
+            if path is None or link in self._stale:
+                return False
+            return source is None or self._entries[path][2] == source
+
+    def invalidate(self, link: str):
+        """
+        Linkin görselini bir sonraki ön yüklemede yeniden indirilecek olarak işaretler.
+        Eski dosya yenisi yazılana kadar kullanılmaya devam eder.
+        """
+        with self._lock:
+            self._ensure_index()
+            if link in self._links and link not in self._stale:
+                self._stale.add(link)
+                self._dirty = True
+
+    def write(self, image: Image.Image, path: str, link: str = None, source: str = None) -> str:
+        """
+        Görseli küçültüp cache formatında atomik olarak yazar, bütçeyi aşarsa eskileri siler.
+        source görselin indirildiği URL'dir. Disk işi yaptığı için event loop dışında çağrılmalıdır.
+        """
+        image.thumbnail((self.max_size, self.max_size))
+        if image.mode in ("RGBA", "LA", "P"):
+            image = image.convert("RGBA")
+            background = Image.new("RGB", image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel("A"))
+            image = background
+        elif image.mode != "RGB":
+            image = image.convert("RGB")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp"
+        image.save(tmp, format=self.image_format, quality=self.quality, optimize=True)
+        os.replace(tmp, path)
+        size = os.path.getsize(path)
+        with self._lock:
+            self._ensure_index()
+            removed = [path] if path in self._entries else []
+            self._add(path, size, link, source)
+            self._stale.discard(link)
+            self._dirty = True
+            removed += self._evict()
+        self._notify_removed(removed)
+        return path
+
+    def touch(self, path: str):
+        """
+        Cache'teki dosyayı en son kullanılan olarak işaretler (ör. bildirimde gönderilirken).
+        """
+        with self._lock:
+            if self._indexed and path in self._entries:
+                self._entries.move_to_end(path)
+                self._dirty = True
+        try:
+            now = time.time()
+            os.utime(path, (now, now))
+        except OSError:
+            pass
+
+    def save_manifest(self):
+        """
+        İndeks değiştiyse manifest'i atomik olarak yazar (thread'de çağrılmalıdır).
+        """
+        with self._lock:
+            if not self._dirty:
+                return
+            entries = [[path, size, link, source] for path, (size, link, source) in self._entries.items()]
+            stale = sorted(self._stale)
+            self._dirty = False
+        try:
+            os.makedirs(os.path.dirname(self.manifest_file) or ".", exist_ok=True)
+            tmp = self.manifest_file + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"version": 2, "entries": entries, "stale": stale}, f, ensure_ascii=False)
+            os.replace(tmp, self.manifest_file)
+        except OSError as e:
+            self._dirty = True
+            logger.warning("ThumbnailCache: Manifest yazılamadı: %s", e)
+            flush_logs()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "files": len(self._entries),
+                "links": len(self._links),
+                "bytes": self._total,
+                "max_bytes": self.max_bytes
+            }
+
+
+thumbnail_cache = ThumbnailCache()
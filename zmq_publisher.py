@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# zmq_publisher.py
+
+import os
+import json
+import asyncio
+import zmq
+import zmq.asyncio
+
+from config import CENTRAL_PUSH_ENDPOINT
+from logconfig import logger, flush_logs
+from metrics import metrics
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+ZMQ_PUSH_ENDPOINT = os.getenv("ZMQ_PUSH_ENDPOINT", CENTRAL_PUSH_ENDPOINT)
+# Karşı taraf yavaşsa socket'te bekletilecek en fazla mesaj; dolunca gönderim bekler
+ZMQ_SNDHWM = int(os.getenv("ZMQ_SNDHWM", "10000"))
+# Kapanışta gönderilmemiş mesajlar için en fazla beklenecek süre (ms)
+ZMQ_LINGER_MS = int(os.getenv("ZMQ_LINGER_MS", "2000"))
+ZMQ_BATCH_SIZE = int(os.getenv("ZMQ_BATCH_SIZE", "100"))
+# HWM dolu kaldıysa batch bu kadar saniye sonra düşürülür
+ZMQ_SEND_TIMEOUT = float(os.getenv("ZMQ_SEND_TIMEOUT", "5"))
+# "json" (her frame mevcut JSON metni) veya "msgpack" (msgpack kuruluysa)
+ZMQ_SERIALIZER = os.getenv("ZMQ_SERIALIZER", "json").strip().lower()
+
+
+class ZmqPublisher:
+    """
+    Merkezi servise tek, uzun ömürlü bir PUSH socket'i üzerinden gönderir.
+    Mesajlar multipart batch olarak gider: her frame bir mesajdır, bu yüzden frame'leri
+    sırayla recv eden mevcut PULL tarafı değişmeden çalışır.
+    Socket ilk gönderimde kendi context'inde açılır. close() context'i sonlandırır;
+    libzmq bu sırada LINGER süresi kadar bekleyip kuyruktaki mesajları iletir.
+    """
+
+    def __init__(
+        self,
+        endpoint: str = ZMQ_PUSH_ENDPOINT,
+        sndhwm: int = ZMQ_SNDHWM,
+        linger_ms: int = ZMQ_LINGER_MS,
+        serializer: str = ZMQ_SERIALIZER,
+        send_timeout: float = ZMQ_SEND_TIMEOUT
+    ):
+        self.endpoint = endpoint
+        self.sndhwm = sndhwm
+        self.linger_ms = linger_ms
+        self.send_timeout = send_timeout
+        if serializer == "msgpack" and msgpack is None:
+            logger.warning("ZmqPublisher: msgpack kurulu değil, JSON kullanılıyor.")
+            serializer = "json"
+        self.serializer = serializer
+        self._context = None
+        self._socket = None
+
+    def _get_socket(self):
+        if self._socket is None:
+            self._context = zmq.asyncio.Context()
+            socket = self._context.socket(zmq.PUSH)
+            socket.setsockopt(zmq.SNDHWM, self.sndhwm)
+            socket.setsockopt(zmq.LINGER, self.linger_ms)
+            socket.connect(self.endpoint)
+            self._socket = socket
+            logger.info("ZmqPublisher: %s adresine bağlandı (SNDHWM=%d).", self.endpoint, self.sndhwm)
+            flush_logs()
+        return self._socket
+
+    def _encode(self, message: str) -> bytes:
+        if self.serializer == "msgpack":
+            return msgpack.packb(json.loads(message), use_bin_type=True)
+        return message.encode("utf-8")
+
+    async def send_batch(self, messages: list[str]) -> bool:
+        """
+        Mesajları tek multipart gönderimle yollar. HWM dolu kalırsa send_timeout
+        sonunda batch düşürülür ve False döner.
+        """
+        if not messages:
+            return True
+        frames = [self._encode(message) for message in messages]
+        try:
+            await asyncio.wait_for(self._get_socket().send_multipart(frames), timeout=self.send_timeout)
+        except asyncio.TimeoutError:
+            logger.error("ZmqPublisher: HWM dolu, %d mesaj düşürüldü.", len(messages))
+            flush_logs()
+            metrics.inc("zmq_messages_dropped", len(messages))
+            return False
+        metrics.inc("zmq_batches")
+        metrics.inc("zmq_messages_sent", len(messages))
+        logger.debug("ZmqPublisher: %d mesaj gönderildi.", len(messages))
+        return True
+
+    async def publish(self, message: str) -> bool:
+        return await self.send_batch([message])
+
+    async def close(self):
+        if self._socket is None:
+            return
+        self._socket.close(linger=self.linger_ms)
+        # term() kuyruktaki mesajlar iletilene (veya LINGER dolana) kadar bloklar
+        await asyncio.to_thread(self._context.term)
+        self._socket = None
+        self._context = None
+        logger.info("ZmqPublisher: Kapatıldı.")
+        flush_logs()
+
+
+zmq_publisher = ZmqPublisher()